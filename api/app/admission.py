@@ -0,0 +1,176 @@
+"""Admission control for LLM calls: RPM and TPM token buckets in front of a bounded FIFO queue.
+
+A call that fits the provider's per-minute budgets goes out at once. Otherwise
+it waits in arrival order for up to LLM_QUEUE_TIMEOUT seconds. A call is
+turned away without waiting when the queue is full (503), or when the calls
+already queued use up the budget past its deadline (429). Rejections carry a
+Retry-After estimate and never fall back to the stub. Limits are per process;
+app.serve divides them across workers.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.chunking import count_tokens
+from app.metrics import registry
+from app.resilience import TokenBucket
+from app.settings import env
+
+# Provider limits; 0 leaves that dimension unlimited, and both at 0 disables admission control
+LLM_RATE_LIMIT_RPM = float(env("LLM_RATE_LIMIT_RPM", "0"))
+LLM_RATE_LIMIT_TPM = float(env("LLM_RATE_LIMIT_TPM", "0"))
+# Completion tokens counted against TPM for a template without max_tokens
+LLM_RATE_LIMIT_OUTPUT_TOKENS = int(env("LLM_RATE_LIMIT_OUTPUT_TOKENS", "500"))
+LLM_QUEUE_MAX = int(env("LLM_QUEUE_MAX", "100"))
+# Longest a call waits for admission
+LLM_QUEUE_TIMEOUT = float(env("LLM_QUEUE_TIMEOUT", "10"))
+
+QUEUE_DEPTH_METRIC = "reprocare_llm_admission_queue_depth"
+WAIT_METRIC = "reprocare_llm_admission_wait_seconds"
+REJECTED_METRIC = "reprocare_llm_admission_rejected_total"
+
+REJECT_QUEUE_FULL = "queue_full"
+# The queue ahead already uses the budget past this call's deadline
+REJECT_OVER_BUDGET = "over_budget"
+REJECT_TIMEOUT = "timeout"
+
+
+class AdmissionRejected(Exception):
+    """The call was not sent; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, status_code: int, retry_after: float):
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"LLM admission rejected ({reason}), retry after {self.retry_after}s")
+
+
+def estimate_tokens(system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None) -> int:
+    """Prompt tokens plus the completion budget, as the provider counts them against TPM."""
+    return count_tokens(system_prompt) + count_tokens(user_prompt) + (max_tokens or LLM_RATE_LIMIT_OUTPUT_TOKENS)
+
+
+class _Waiter:
+    __slots__ = ("tokens", "wakeup")
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.wakeup = asyncio.Event()
+
+
+class AdmissionController:
+    """Per-process RPM/TPM buckets and the FIFO queue of calls waiting for them."""
+
+    def __init__(self, rpm: float = LLM_RATE_LIMIT_RPM, tpm: float = LLM_RATE_LIMIT_TPM,
+                 max_queue: int = LLM_QUEUE_MAX, timeout: float = LLM_QUEUE_TIMEOUT):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._queue: Deque[_Waiter] = deque()
+        # Buckets are also paused from the blocking chat() path, on another thread
+        self._lock = threading.Lock()
+        if self.enabled:
+            # Export a depth of 0 before the first call queues
+            registry.gauge(QUEUE_DEPTH_METRIC)
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests is not None or self.tokens is not None
+
+    def _wait_time(self, requests: int, tokens: int, now: float) -> float:
+        waits: List[float] = [0.0]
+        with self._lock:
+            if self.requests is not None:
+                waits.append(self.requests.wait_time(requests, now))
+            if self.tokens is not None:
+                waits.append(self.tokens.wait_time(tokens, now))
+        return max(waits)
+
+    def _estimate(self, tokens: int, now: float) -> float:
+        """Seconds until this call would be admitted behind everything queued."""
+        return self._wait_time(len(self._queue) + 1, tokens + sum(w.tokens for w in self._queue), now)
+
+    def _take(self, tokens: int, now: float) -> None:
+        with self._lock:
+            if self.requests is not None:
+                self.requests.take(1, now)
+            if self.tokens is not None:
+                self.tokens.take(tokens, now)
+
+    def _reject(self, reason: str, status_code: int, retry_after: float) -> None:
+        registry.counter(REJECTED_METRIC, reason=reason).inc()
+        raise AdmissionRejected(reason, status_code, retry_after)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for budget in FIFO order; raises AdmissionRejected instead of waiting past the deadline."""
+        if not self.enabled:
+            return
+        start = time.monotonic()
+        # A call larger than a whole minute's budget would never fit; charge it the full minute
+        if self.tokens is not None:
+            tokens = min(tokens, int(self.tokens.capacity))
+        if not self._queue and self._wait_time(1, tokens, start) == 0:
+            self._take(tokens, start)
+            registry.histogram(WAIT_METRIC).observe(0.0)
+            return
+        if len(self._queue) >= self.max_queue:
+            self._reject(REJECT_QUEUE_FULL, 503, self._estimate(tokens, start))
+        estimate = self._estimate(tokens, start)
+        if estimate > self.timeout:
+            self._reject(REJECT_OVER_BUDGET, 429, estimate)
+
+        waiter = _Waiter(tokens)
+        self._queue.append(waiter)
+        depth = registry.gauge(QUEUE_DEPTH_METRIC)
+        depth.inc()
+        deadline = start + self.timeout
+        try:
+            while True:
+                now = time.monotonic()
+                # Only the head of the queue spends budget, so later calls can't overtake it
+                if self._queue[0] is waiter:
+                    delay = self._wait_time(1, tokens, now)
+                    if delay == 0:
+                        self._take(tokens, now)
+                        break
+                else:
+                    delay = deadline - now
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._reject(REJECT_TIMEOUT, 429, self._estimate(tokens, now))
+                waiter.wakeup.clear()
+                try:
+                    await asyncio.wait_for(waiter.wakeup.wait(), min(delay, remaining))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._queue.remove(waiter)
+            depth.dec()
+            if self._queue:
+                self._queue[0].wakeup.set()
+        registry.histogram(WAIT_METRIC).observe(time.monotonic() - start)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued call for `seconds`, e.g. after the provider answered 429."""
+        now = time.monotonic()
+        with self._lock:
+            for bucket in (self.requests, self.tokens):
+                if bucket is not None:
+                    bucket.pause(seconds, now)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queued": len(self._queue),
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout,
+            "rpm": self.requests.capacity if self.requests else None,
+            "tpm": self.tokens.capacity if self.tokens else None,
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,44 @@
+"""Append-only visit audit trail stored in the `visit_event` table."""
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models import VisitEvent
+
+
+def record_event(db: Session, visit_id: str, event_type: str, ts: Optional[datetime] = None) -> None:
+    """Queue one audit event in the session; it is written with the next commit."""
+    db.add(VisitEvent(visit_id=visit_id, event_type=event_type, ts=ts or datetime.utcnow()))
+
+
+def record_events(db: Session, events: Iterable[Tuple[str, str, Optional[datetime]]]) -> int:
+    """Insert many (visit_id, event_type, ts) events in one executemany."""
+    now = datetime.utcnow()
+    rows = [
+        {"visit_id": visit_id, "event_type": event_type, "ts": ts or now}
+        for visit_id, event_type, ts in events
+    ]
+    if rows:
+        db.execute(insert(VisitEvent), rows)
+    return len(rows)
+
+
+def load_audit_events(db: Session, visit_id: str) -> List[str]:
+    """Events for one visit in the legacy `type:iso-timestamp` string form."""
+    rows = (
+        db.query(VisitEvent.event_type, VisitEvent.ts)
+        .filter(VisitEvent.visit_id == visit_id)
+        .order_by(VisitEvent.ts, VisitEvent.id)
+        .all()
+    )
+    return [f"{event_type}:{ts.isoformat()}" for event_type, ts in rows]
+
+
+def parse_legacy_event(entry: str) -> Tuple[str, Optional[datetime]]:
+    """Split a legacy `type:iso-timestamp` string; timestamps may contain colons."""
+    event_type, _, raw_ts = entry.partition(":")
+    try:
+        return event_type, datetime.fromisoformat(raw_ts)
+    except ValueError:
+        return entry, None
@@ -0,0 +1,178 @@
+import time
+import json
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from app.settings import env, env_flag
+
+LLM_CACHE_ENABLED = env_flag("LLM_CACHE_ENABLED", "true")
+LLM_CACHE_MAX_ENTRIES = int(env("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(env("LLM_CACHE_TTL", "3600"))
+# Optional second tier on disk, e.g. ./data/llm_cache.sqlite
+LLM_CACHE_PATH = env("LLM_CACHE_PATH")
+LLM_CACHE_DISK_MAX_ENTRIES = int(env("LLM_CACHE_DISK_MAX_ENTRIES", "100000"))
+# Seconds a worker waits for another worker's write lock on the disk tier
+DISK_CACHE_BUSY_TIMEOUT = float(env("DISK_CACHE_BUSY_TIMEOUT", "5"))
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so cosmetic differences map to the same key."""
+    return "\n".join(" ".join(line.split()) for line in prompt.strip().splitlines() if line.strip())
+
+
+def cache_key(model: str, system_prompt: str, user_prompt: str, temperature: float) -> str:
+    """Content address for a completion request."""
+    material = json.dumps(
+        [model, system_prompt.strip(), normalize_prompt(user_prompt), temperature],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """SQLite-backed tier shared across restarts and across worker processes.
+
+    WAL lets every worker read while one writes; the busy timeout makes
+    concurrent writers (and concurrent first-time setup) wait instead of failing.
+    Caches sharing a file use separate tables, so each keeps its own size cap.
+    """
+
+    # Trimming to max_entries scans the table, so only do it every this many writes
+    EVICT_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int, ttl: float, table: str = "llm_cache"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=DISK_CACHE_BUSY_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_created_at ON {table} (created_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[1] > self.ttl:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                # Size-based eviction, oldest first
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table}")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class LLMCache:
+    """Two-tier (in-process LRU, optional SQLite) cache of LLM completions."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, disk: Optional[DiskCache] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk = disk
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if time.monotonic() - created_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._put(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def _put(self, key: str, value: str) -> None:
+        self._entries[key] = (value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                "enabled": LLM_CACHE_ENABLED,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+        stats["disk_entries"] = len(self.disk) if self.disk is not None else None
+        return stats
+
+
+llm_cache = LLMCache(
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl=LLM_CACHE_TTL,
+    disk=DiskCache(LLM_CACHE_PATH, LLM_CACHE_DISK_MAX_ENTRIES, LLM_CACHE_TTL) if LLM_CACHE_PATH else None,
+)
@@ -0,0 +1,71 @@
+"""Token-budgeted splitting of transcripts on utterance boundaries."""
+import re
+import hashlib
+from functools import lru_cache
+from typing import Callable, List
+
+
+@lru_cache(maxsize=1)
+def _tokenizer() -> Callable[[str], int]:
+    """Exact counts with tiktoken when installed, otherwise ~4 characters per token."""
+    try:
+        import tiktoken
+    except ImportError:
+        return lambda text: (len(text) + 3) // 4
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: str) -> int:
+    return _tokenizer()(text)
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_utterances(text: str) -> List[str]:
+    """One entry per transcript line (speaker turn); blank lines are dropped."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _split_oversized(utterance: str, budget: int) -> List[str]:
+    """Break a single over-budget utterance on sentences, then on words."""
+    pieces: List[str] = []
+    for sentence in _SENTENCE_END.split(utterance):
+        if count_tokens(sentence) <= budget:
+            pieces.append(sentence)
+            continue
+        words: List[str] = []
+        for word in sentence.split():
+            if words and count_tokens(" ".join(words + [word])) > budget:
+                pieces.append(" ".join(words))
+                words = []
+            words.append(word)
+        if words:
+            pieces.append(" ".join(words))
+    return pieces
+
+
+def chunk_text(text: str, budget: int) -> List[str]:
+    """Greedily pack whole utterances into chunks of at most `budget` tokens."""
+    chunks: List[str] = []
+    current: List[str] = []
+    used = 0
+    for utterance in split_utterances(text):
+        tokens = count_tokens(utterance)
+        pieces = [utterance] if tokens <= budget else _split_oversized(utterance, budget)
+        for piece in pieces:
+            # +1 for the newline joining it to the previous utterance
+            cost = count_tokens(piece) + 1 if len(pieces) > 1 else tokens + 1
+            if current and used + cost > budget:
+                chunks.append("\n".join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += cost
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8")).hexdigest()
@@ -1,38 +1,110 @@
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
-import os
-from dotenv import load_dotenv
+from typing import Dict, Optional
+from app.metrics import observe
+from app.settings import env, env_flag, settings
+import time
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-database_url = os.getenv("DATABASE_URL", "sqlite:///./mvp.sqlite")
+database_url = settings.database_url
 
-engine = create_engine(
-    database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in database_url else {}
-)
+# SQLite connection pragmas
+SQLITE_JOURNAL_MODE = env("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = env("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(env("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(env("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Pool settings for server databases (Postgres)
+DB_POOL_SIZE = int(env("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(env("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(env("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(env("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = env_flag("DB_POOL_PRE_PING", "true")
+DB_STATEMENT_TIMEOUT_MS = int(env("DB_STATEMENT_TIMEOUT_MS", "15000"))
+
+
+def sqlite_pragmas() -> Dict[str, str]:
+    """Pragmas applied to every new SQLite connection."""
+    return {
+        "journal_mode": SQLITE_JOURNAL_MODE,
+        "synchronous": SQLITE_SYNCHRONOUS,
+        "busy_timeout": str(SQLITE_BUSY_TIMEOUT_MS),
+        "mmap_size": str(SQLITE_MMAP_SIZE),
+    }
+
+
+def create_db_engine(url: str, pragmas: Optional[Dict[str, str]] = None) -> Engine:
+    """Build an engine tuned for the database backend in `url`.
+
+    SQLite gets WAL journaling and the other pragmas on connect so readers
+    don't block behind writers. Postgres gets a sized, pre-pinged, recycled
+    pool and a server-side statement timeout.
+    """
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        )
+        pragmas = sqlite_pragmas() if pragmas is None else pragmas
+
+        @event.listens_for(engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+        return engine
+
+    connect_args = {}
+    if url.startswith("postgres") and DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    return create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+engine = create_db_engine(database_url)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+# Commit timing: before_commit fires ahead of the flush, so the span covers the writes too
+@event.listens_for(SessionLocal, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        observe("db", "commit", time.perf_counter() - started)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _commit_abandoned(session):
+    session.info.pop("commit_started", None)
+
+
 def init_db():
-    """Initialize database and run migrations."""
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
-    
-    # Run migrations for existing tables
-    if "sqlite" in database_url:
-        inspector = inspect(engine)
-        if "visit" in inspector.get_table_names():
-            columns = [col["name"] for col in inspector.get_columns("visit")]
-            
-            # Migration: Add transcription_text column if it doesn't exist
-            if "transcription_text" not in columns:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE visit ADD COLUMN transcription_text TEXT"))
-                    conn.commit()
-                print("✓ Added transcription_text column to visit table")
+    """Bring the database to the latest schema (see app.migrations).
+
+    Called from the app lifespan and by app.seed / app.migrate. A database
+    that is already current costs one indexed read.
+    """
+    from app.migrations import upgrade
+    upgrade(engine)
 
 
 def get_db():
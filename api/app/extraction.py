@@ -0,0 +1,126 @@
+"""Find the JSON object in LLM output that wraps it in prose or code fences."""
+import json
+from typing import Any, Dict, Optional
+
+from pydantic import ValidationError
+
+from app.metrics import registry
+
+PARSE_METRIC = "reprocare_llm_parse_total"
+
+# Outcomes counted per prompt kind; the parse-failure rate is failed / all outcomes
+PARSE_OK = "ok"                # a bare JSON object that validated
+PARSE_EXTRACTED = "extracted"  # valid, but wrapped in prose or fences
+PARSE_REPAIRED = "repaired"    # invalid fields fixed by a repair prompt
+PARSE_INVALID = "invalid"      # some fields still invalid and dropped
+PARSE_FAILED = "failed"        # no usable JSON object; the canned fallback was used
+
+
+def record_parse(kind: str, outcome: str) -> None:
+    registry.counter(PARSE_METRIC, kind=kind, outcome=outcome).inc()
+
+
+class JSONObjectScanner:
+    """Incremental brace-balanced scan for the first `{...}` that parses as a JSON object.
+
+    feed() text as it arrives, all at once or token by token; each character
+    is scanned once unless a balanced span turns out not to be JSON, in which
+    case scanning resumes just after its opening brace. Braces inside JSON
+    strings are ignored, and raw newlines in strings are accepted.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._end: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add text; returns the object once one is complete (and on every later call)."""
+        if self.result is not None:
+            self._text += chunk
+            return self.result
+        self._text += chunk
+        self._scan()
+        return self.result
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """End of input: an object still open when text ran out may hide a later one."""
+        while self.result is None and self._start is not None:
+            self._restart_after(self._start)
+            self._scan()
+        return self.result
+
+    @property
+    def wrapped(self) -> bool:
+        """True when the object had non-whitespace text around it."""
+        if self.result is None:
+            return False
+        return bool(self._text[:self._start].strip() or self._text[self._end:].strip())
+
+    def _restart_after(self, index: int) -> None:
+        self._pos = index + 1
+        self._start = None
+
+    def _scan(self) -> None:
+        text = self._text
+        i = self._pos
+        while i < len(text):
+            if self._start is None:
+                i = text.find("{", i)
+                if i < 0:
+                    i = len(text)
+                    break
+                self._start, self._depth, self._in_string, self._escape = i, 1, False, False
+                i += 1
+                continue
+            ch = text[i]
+            i += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        value = json.loads(text[self._start:i], strict=False)
+                    except ValueError:
+                        value = None
+                    if isinstance(value, dict):
+                        self.result = value
+                        self._end = i
+                        self._pos = i
+                        return
+                    # Braces in prose, not JSON; try again from the next opening brace
+                    i = self._start + 1
+                    self._start = None
+        self._pos = i
+
+
+def extract_json_object(text: str) -> JSONObjectScanner:
+    """Scan complete text; the scanner carries the result and whether it was wrapped."""
+    scanner = JSONObjectScanner()
+    scanner.feed(text or "")
+    scanner.close()
+    return scanner
+
+
+def field_errors(error: ValidationError) -> Dict[str, str]:
+    """Top-level field name -> first validation message for that field."""
+    errors: Dict[str, str] = {}
+    for entry in error.errors():
+        if entry["loc"]:
+            errors.setdefault(str(entry["loc"][0]), entry["msg"])
+    return errors
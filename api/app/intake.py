@@ -0,0 +1,143 @@
+"""Intake Q and A conversion shared by the single and batch endpoints."""
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import json
+
+from pydantic import ValidationError
+
+from app.extraction import (
+    extract_json_object, field_errors, record_parse,
+    PARSE_EXTRACTED, PARSE_FAILED, PARSE_INVALID, PARSE_OK, PARSE_REPAIRED,
+)
+from app.llm import acomplete, LLMUnavailable
+from app.prompts import registry, RenderedPrompt, INTAKE_PROMPT, INTAKE_REPAIR_PROMPT
+from app.schemas import IntakeStructured, QAPair
+from app.settings import env_flag
+
+# Re-prompt once for intake_structured fields that fail validation, instead of dropping them
+INTAKE_REPAIR = env_flag("INTAKE_REPAIR", "true")
+
+
+def build_intake_prompts(qa: List[QAPair]) -> RenderedPrompt:
+    """Render the active intake template for the Q and A."""
+    qa_text = "\n".join([f"Q: {item.q}\nA: {item.a}" for item in qa])
+    return registry.get(INTAKE_PROMPT).render(qa_text=qa_text)
+
+
+class ParsedIntake(NamedTuple):
+    intake_structured: Dict[str, Any]
+    provider_note: str
+    patient_summary: str
+    # False when no JSON object was found and the canned fallback text was used
+    parsed: bool
+    # intake_structured fields that failed IntakeStructured validation: name -> (value, reason)
+    invalid_fields: Dict[str, Tuple[Any, str]]
+    wrapped: bool = False
+    # True when the repair call was answered by the stub because the provider failed; nothing was repaired
+    fallback: bool = False
+
+
+FALLBACK_PROVIDER_NOTE = "Intake completed. Review patient responses."
+FALLBACK_PATIENT_SUMMARY = "We reviewed your intake information."
+
+
+def _validate_structured(raw: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Tuple[Any, str]]]:
+    """Coerce fields to IntakeStructured; invalid ones become None and are reported."""
+    try:
+        model = IntakeStructured.model_validate(raw)
+        return {**raw, **model.model_dump(exclude_unset=True)}, {}
+    except ValidationError as e:
+        errors = field_errors(e)
+    valid = {key: value for key, value in raw.items() if key not in errors}
+    model = IntakeStructured.model_validate(valid)
+    invalid = {name: (raw.get(name), reason) for name, reason in errors.items()}
+    return {**valid, **model.model_dump(exclude_unset=True), **{name: None for name in errors}}, invalid
+
+
+def parse_intake_response(response_text: str) -> ParsedIntake:
+    """Extract the JSON object from the completion and validate intake_structured.
+
+    Prose or code fences around the object are ignored. Without any object
+    the canned fallback text is returned with parsed=False.
+    """
+    scanner = extract_json_object(response_text)
+    parsed = scanner.result
+    if parsed is None:
+        return ParsedIntake({}, FALLBACK_PROVIDER_NOTE, FALLBACK_PATIENT_SUMMARY, False, {})
+    
+    raw_structured = parsed.get("intake_structured")
+    intake_structured, invalid = _validate_structured(raw_structured if isinstance(raw_structured, dict) else {})
+    provider_note = parsed.get("provider_note")
+    patient_summary = parsed.get("patient_summary")
+    return ParsedIntake(
+        intake_structured,
+        provider_note if isinstance(provider_note, str) else "",
+        patient_summary if isinstance(patient_summary, str) else "",
+        True,
+        invalid,
+        scanner.wrapped,
+    )
+
+
+def build_repair_prompts(invalid_fields: Dict[str, Tuple[Any, str]]) -> RenderedPrompt:
+    """Ask for the failing fields only, with their schema, rejected value and reason."""
+    properties = IntakeStructured.model_json_schema()["properties"]
+    lines = [
+        f"- {name}: schema {json.dumps(properties.get(name, {}))}; got {json.dumps(value, default=str)} ({reason})"
+        for name, (value, reason) in invalid_fields.items()
+    ]
+    return registry.get(INTAKE_REPAIR_PROMPT).render(fields="\n".join(lines))
+
+
+async def repair_intake(result: ParsedIntake) -> ParsedIntake:
+    """One targeted re-prompt for the invalid fields; fields still invalid stay None."""
+    try:
+        completion = await acomplete(*build_repair_prompts(result.invalid_fields))
+    except LLMUnavailable:
+        return result
+    if completion.fallback:
+        # Canned text is not a correction; keep the invalid fields and let the caller audit it
+        return result._replace(fallback=True)
+    fixes = extract_json_object(completion.text).result or {}
+    candidate = {name: fixes[name] for name in result.invalid_fields if name in fixes}
+    repaired, still_invalid = _validate_structured(candidate)
+    invalid = {
+        name: value for name, value in result.invalid_fields.items()
+        if name in still_invalid or name not in candidate
+    }
+    fixed = {name: value for name, value in repaired.items() if name not in invalid}
+    return result._replace(intake_structured={**result.intake_structured, **fixed}, invalid_fields=invalid)
+
+
+async def parse_intake_completion(response_text: str) -> ParsedIntake:
+    """parse_intake_response plus a repair prompt for invalid fields; counts the outcome."""
+    result = parse_intake_response(response_text)
+    if not result.parsed:
+        record_parse("intake", PARSE_FAILED)
+        return result
+    if result.invalid_fields and INTAKE_REPAIR:
+        result = await repair_intake(result)
+        record_parse("intake", PARSE_INVALID if result.invalid_fields else PARSE_REPAIRED)
+        return result
+    if result.invalid_fields:
+        record_parse("intake", PARSE_INVALID)
+    else:
+        record_parse("intake", PARSE_EXTRACTED if result.wrapped else PARSE_OK)
+    return result
+
+
+def intake_visit_values(
+    qa: List[QAPair],
+    intake_structured: Dict[str, Any],
+    provider_note: str,
+    patient_summary: str,
+    template: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Column values written to the visit once intake is converted; `template` is the prompt id used."""
+    return {
+        "intake_raw": [{"q": item.q, "a": item.a} for item in qa],
+        "intake_structured": intake_structured,
+        "provider_note": provider_note,
+        "patient_summary": patient_summary,
+        "status": "intake_complete",
+        "intake_template": template,
+    }
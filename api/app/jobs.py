@@ -0,0 +1,265 @@
+"""In-process background jobs persisted in the `job` table."""
+import random
+import asyncio
+import logging
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, load_only
+
+from app.db import SessionLocal
+from app.models import Job, Visit
+from app.llm import acomplete
+from app.post_visit import (
+    prepare_post_visit_prompts, parse_post_visit_response, apply_post_visit_result, post_visit_events,
+)
+from app.whereby import (
+    lookup_transcription, TRANSCRIPTION_READY, TRANSCRIPTION_NOT_READY, TRANSCRIPTION_NOT_FOUND
+)
+from app.schemas import PostVisitResponse
+from app.log import bind_visit
+from app.write_behind import write_behind
+from app.settings import env
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(env("JOB_WORKERS", "2"))
+JOB_POLL_INTERVAL = float(env("JOB_POLL_INTERVAL", "1"))
+JOB_MAX_ATTEMPTS = int(env("JOB_MAX_ATTEMPTS", "6"))
+JOB_RETRY_BASE_SECONDS = float(env("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_RETRY_MAX_SECONDS = float(env("JOB_RETRY_MAX_SECONDS", "120"))
+# A running job untouched for this long belongs to a worker that died or restarted; any worker may reclaim it
+JOB_LEASE_SECONDS = float(env("JOB_LEASE_SECONDS", "300"))
+
+POST_VISIT_SUMMARY = "post_visit_summary"
+
+
+class RetryLater(Exception):
+    """Raised by a handler when the job should be re-run after a backoff."""
+
+
+def enqueue(db: Session, kind: str, visit_id: Optional[str], payload: Dict[str, Any]) -> Job:
+    """Persist a new job; the caller commits and then calls runner.notify()."""
+    job = Job(kind=kind, visit_id=visit_id, payload=payload, status="queued", stage="queued")
+    db.add(job)
+    return job
+
+
+def active_job(db: Session, kind: str, visit_id: Optional[str]) -> Optional[Job]:
+    """The visit's oldest job of this kind that is still queued, retrying or running, if any."""
+    return (
+        db.query(Job)
+        .filter(Job.kind == kind, Job.visit_id == visit_id, Job.status.in_(["queued", "retrying", "running"]))
+        .order_by(Job.created_at)
+        .first()
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter."""
+    ceiling = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+def _commit_stage(db: Session, job: Job, stage: str) -> None:
+    job.stage = stage
+    job.updated_at = datetime.utcnow()
+    db.commit()
+
+
+async def _set_stage(db: Session, job: Job, stage: str) -> None:
+    # Commits can wait on SQLite's write lock; keep them off the event loop
+    await run_in_threadpool(_commit_stage, db, job, stage)
+
+
+def _load_visit(db: Session, visit_id: Optional[str]) -> Optional[Visit]:
+    return (
+        db.query(Visit)
+        .options(load_only(
+            Visit.id, Visit.video_room_id, Visit.transcription_id, Visit.provider_note, Visit.intake_structured,
+        ))
+        .filter(Visit.id == visit_id)
+        .first()
+    )
+
+
+def _save_summary(
+    db: Session, visit: Visit, result: PostVisitResponse, template: Optional[str], fallback: bool
+) -> None:
+    apply_post_visit_result(db, visit, result, template)
+    db.commit()
+    # Audit events are group-committed by the writer; the summary itself is already durable
+    write_behind.submit(db, visit.id, events=post_visit_events(fallback))
+    db.commit()
+
+
+async def run_post_visit_summary(job: Job, db: Session) -> Dict[str, Any]:
+    """Wait for the Whereby transcript, then generate and store the summary.
+
+    Database work runs in the threadpool; only the awaits on Whereby and the LLM stay on the loop.
+    """
+    visit = await run_in_threadpool(_load_visit, db, job.visit_id)
+    if not visit:
+        raise ValueError("Visit not found")
+
+    payload = job.payload or {}
+    transcription_text = None
+    if visit.video_room_id:
+        await _set_stage(db, job, "fetching_transcript")
+        transcription_text, state, transcription_id = await run_in_threadpool(
+            lookup_transcription, visit.video_room_id, visit.transcription_id
+        )
+        if state == TRANSCRIPTION_READY and transcription_id != visit.transcription_id:
+            # Pin the meeting to this visit; committed with the next stage
+            visit.transcription_id = transcription_id
+        # Whereby needs a few minutes after the meeting ends; keep polling with backoff,
+        # then summarize from the provider note once attempts run out
+        if transcription_text is None and state in (TRANSCRIPTION_NOT_READY, TRANSCRIPTION_NOT_FOUND):
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                await _set_stage(db, job, "waiting_for_transcript")
+                raise RetryLater(f"transcription {state}")
+
+    await _set_stage(db, job, "summarizing")
+    # Long transcripts are condensed chunk by chunk first; LLMUnavailable propagates
+    # so the job is retried with backoff, and cached chunk notes make the retry cheap
+    prompt, chunk_fallback = await prepare_post_visit_prompts(
+        transcription_text,
+        payload.get("provider_note") or visit.provider_note or "",
+        payload.get("intake_structured") or visit.intake_structured or {},
+        visit.transcription_id if transcription_text else None,
+    )
+    completion = await acomplete(*prompt)
+    result = parse_post_visit_response(completion.text)
+
+    await run_in_threadpool(
+        _save_summary, db, visit, result, prompt.template, completion.fallback or chunk_fallback
+    )
+    return result.model_dump()
+
+
+HANDLERS: Dict[str, Callable[[Job, Session], Awaitable[Optional[Dict[str, Any]]]]] = {
+    POST_VISIT_SUMMARY: run_post_visit_summary,
+}
+
+
+class JobRunner:
+    """Pool of asyncio worker tasks draining the job table."""
+
+    def __init__(self, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after an enqueue."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _claim_next(self, db: Session) -> Optional[Job]:
+        """Atomically move the next due job to running; None if nothing is due.
+
+        Jobs still marked running past JOB_LEASE_SECONDS are due too. Several
+        worker processes share the table, so a job left by a crashed worker
+        is picked up by a live one, while jobs other workers are running are
+        left alone. The claim is a conditional UPDATE, so only one worker wins.
+        """
+        now = datetime.utcnow()
+        candidate = (
+            db.query(Job.id, Job.status, Job.updated_at)
+            .filter(or_(
+                and_(Job.status.in_(["queued", "retrying"]), Job.next_run_at <= now),
+                and_(Job.status == "running", Job.updated_at < now - timedelta(seconds=JOB_LEASE_SECONDS)),
+            ))
+            .order_by(Job.next_run_at)
+            .first()
+        )
+        if candidate is None:
+            return None
+        if candidate.status == "running":
+            logger.warning("Reclaiming job with an expired lease", extra={"job_id": candidate.id})
+        claimed = (
+            db.query(Job)
+            .filter(Job.id == candidate.id, Job.status == candidate.status, Job.updated_at == candidate.updated_at)
+            .update(
+                {"status": "running", "attempts": Job.attempts + 1, "updated_at": now},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if not claimed:
+            return None
+        return db.query(Job).filter(Job.id == candidate.id).first()
+
+    async def _work(self) -> None:
+        while True:
+            # Nothing is expired on commit: the handler reads the job and visit on the event loop
+            # between threadpool commits, and a reload there would block the loop on the pool
+            db = SessionLocal(expire_on_commit=False)
+            try:
+                job = await run_in_threadpool(self._claim_next, db)
+                if job is not None:
+                    await self._run(job, db)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker error")
+                job = None
+            finally:
+                db.close()
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _run(self, job: Job, db: Session) -> None:
+        handler = HANDLERS.get(job.kind)
+        bind_visit(job.visit_id)
+        error: Optional[Exception] = None
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            job.result = await handler(job, db)
+        except Exception as e:
+            error = e
+        await run_in_threadpool(self._finish, job, db, error)
+
+    def _finish(self, job: Job, db: Session, error: Optional[Exception]) -> None:
+        """Record the attempt's outcome; runs in the threadpool, as the rollback reloads the job."""
+        if error is None:
+            job.status = "succeeded"
+            job.stage = "done"
+            job.error = None
+        elif isinstance(error, RetryLater):
+            db.rollback()
+            job.status = "retrying"
+            job.error = str(error)
+            job.next_run_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+            logger.info("Job waiting to retry", extra={"job_id": job.id, "attempts": job.attempts, "reason": str(error)})
+        else:
+            db.rollback()
+            if job.attempts < JOB_MAX_ATTEMPTS:
+                job.status = "retrying"
+                job.next_run_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+            else:
+                job.status = "failed"
+            job.error = str(error)
+            logger.warning("Job attempt failed", extra={"job_id": job.id, "attempts": job.attempts, "status": job.status, "error": str(error)})
+        job.updated_at = datetime.utcnow()
+        db.commit()
+
+runner = JobRunner()
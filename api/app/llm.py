@@ -1,67 +1,577 @@
-import os
-import requests
+import time
+import asyncio
+import logging
+import httpx
 import json
-from typing import Dict, Any
-from dotenv import load_dotenv
+from typing import Dict, Any, Optional, AsyncIterator, NamedTuple, Tuple
 
-load_dotenv()
+from app.admission import admission, estimate_tokens, AdmissionRejected
+from app.cache import llm_cache, cache_key, LLM_CACHE_ENABLED
+from app.metrics import span
+from app.prompts import (
+    GenerationOptions, registry, INTAKE_PROMPT, INTAKE_REPAIR_PROMPT, POST_VISIT_PROMPT, POST_VISIT_NOTE_PROMPT,
+    POST_VISIT_CHUNK_PROMPT,
+)
+from app.resilience import CircuitBreaker, LatencyWindow, backoff_delay
+from app.settings import env, env_flag, settings
 
-LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1/chat/completions")
-LLM_API_KEY = os.getenv("LLM_API_KEY")
+logger = logging.getLogger(__name__)
 
+LLM_BASE_URL = settings.llm_base_url
+LLM_API_KEY = settings.llm_api_key
+# Defaults to gpt-3.5-turbo (chat) or gpt-3.5-turbo-instruct (legacy completions)
+LLM_MODEL = env("LLM_MODEL")
 
-def chat(system_prompt: str, user_prompt: str) -> str:
-    """Call LLM API with system and user prompts."""
-    
-    if not LLM_API_KEY:
-        # Return stub responses for demo
-        return _get_stub_response(system_prompt, user_prompt)
-    
+# Optional second endpoint and/or model that slow requests are hedged to
+LLM_HEDGE_BASE_URL = env("LLM_HEDGE_BASE_URL")
+LLM_HEDGE_MODEL = env("LLM_HEDGE_MODEL")
+LLM_HEDGE_API_KEY = env("LLM_HEDGE_API_KEY") or LLM_API_KEY
+# Hedge once the primary is slower than this quantile of its recent latencies;
+# LLM_HEDGE_DELAY is used until LLM_HEDGE_MIN_SAMPLES calls have been seen
+LLM_HEDGE_QUANTILE = float(env("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_DELAY = float(env("LLM_HEDGE_DELAY", "2"))
+LLM_HEDGE_MIN_SAMPLES = int(env("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+# Dispatcher deadlines, retries and circuit breaker
+LLM_ATTEMPT_TIMEOUT = float(env("LLM_ATTEMPT_TIMEOUT", "8"))
+LLM_DEADLINE = float(env("LLM_DEADLINE", "20"))
+LLM_MAX_RETRIES = int(env("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(env("LLM_RETRY_BACKOFF", "0.25"))
+LLM_RETRY_BACKOFF_MAX = float(env("LLM_RETRY_BACKOFF_MAX", "2"))
+LLM_BREAKER_FAILURES = int(env("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(env("LLM_BREAKER_RESET", "30"))
+# Serve the canned demo response when the provider is down instead of failing the request
+LLM_STUB_FALLBACK = env_flag("LLM_STUB_FALLBACK", "false")
+
+# Connection pool settings for the shared async client
+LLM_TIMEOUT = float(env("LLM_TIMEOUT", "10"))
+LLM_MAX_CONNECTIONS = int(env("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(env("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(env("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_HTTP2 = env_flag("LLM_HTTP2", "true")
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+class LLMUnavailable(Exception):
+    """The provider could not answer and stub fallback is disabled."""
+
+
+class LLMOverloaded(LLMUnavailable):
+    """Admission control turned the call away before it reached the provider."""
+
+    def __init__(self, rejected: AdmissionRejected):
+        super().__init__(str(rejected))
+        # 429 when the rate budget can't fit the call in time, 503 when the wait queue is full
+        self.status_code = rejected.status_code
+        self.retry_after = rejected.retry_after
+
+
+class CircuitOpenError(Exception):
+    """Every configured endpoint has an open circuit breaker."""
+
+
+class LLMResult(NamedTuple):
+    text: str
+    # "primary", "hedge", "cache", "stub" (no API key) or "fallback" (provider failed)
+    source: str
+    error: Optional[str] = None
+
+    @property
+    def fallback(self) -> bool:
+        return self.source == "fallback"
+
+
+class LLMEndpoint:
+    """One provider URL/model with its own breaker and latency window."""
+
+    def __init__(self, name: str, base_url: str, api_key: Optional[str], model: Optional[str]):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.breaker = CircuitBreaker(name, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        self.latency = LatencyWindow()
+
+    def hedge_delay(self) -> float:
+        if len(self.latency) < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_DELAY
+        return self.latency.quantile(LLM_HEDGE_QUANTILE)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "url": self.base_url,
+            "model": self.model,
+            **self.breaker.snapshot(),
+            "p95_seconds": self.latency.quantile(0.95),
+        }
+
+
+PRIMARY = LLMEndpoint("primary", LLM_BASE_URL, LLM_API_KEY, LLM_MODEL)
+HEDGE = (
+    LLMEndpoint("hedge", LLM_HEDGE_BASE_URL or LLM_BASE_URL, LLM_HEDGE_API_KEY, LLM_HEDGE_MODEL or LLM_MODEL)
+    if LLM_HEDGE_BASE_URL or LLM_HEDGE_MODEL
+    else None
+)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled client, creating it on first use."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            http2=LLM_HTTP2 and _http2_available(),
+            timeout=LLM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+    return _async_client
+
+
+async def aclose_client() -> None:
+    """Close the shared async client (called on app shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _build_request(
+    system_prompt: str, user_prompt: str, endpoint: Optional[LLMEndpoint] = None,
+    options: Optional[GenerationOptions] = None,
+) -> Dict[str, Any]:
+    """Build headers and payload for an LLM endpoint (the primary by default).
+
+    The template's model replaces LLM_MODEL, except on a hedge endpoint with
+    its own LLM_HEDGE_MODEL.
+    """
+    endpoint = endpoint or PRIMARY
+    options = options or GenerationOptions()
+    model = (endpoint is HEDGE and LLM_HEDGE_MODEL) or options.model or endpoint.model
     headers = {
-        "Authorization": f"Bearer {LLM_API_KEY}",
+        "Authorization": f"Bearer {endpoint.api_key}",
         "Content-Type": "application/json"
     }
     
     # Check if it's OpenAI-style chat completions
-    if "chat/completions" in LLM_BASE_URL:
+    if "chat/completions" in endpoint.base_url:
         payload = {
-            "model": "gpt-3.5-turbo",
+            "model": model or "gpt-3.5-turbo",
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            "temperature": 0.7
+            "temperature": options.temperature
         }
+        if options.max_tokens:
+            payload["max_tokens"] = options.max_tokens
     else:
         # Legacy completions format
         payload = {
-            "model": "gpt-3.5-turbo-instruct",
+            "model": model or "gpt-3.5-turbo-instruct",
             "prompt": f"{system_prompt}\n\n{user_prompt}",
-            "temperature": 0.7,
-            "max_tokens": 1000
+            "temperature": options.temperature,
+            "max_tokens": options.max_tokens or 1000
         }
     
+    return {"headers": headers, "payload": payload}
+
+
+def _extract_content(data: Dict[str, Any]) -> str:
+    """Pull the completion text out of a chat or legacy completions response."""
+    if "choices" in data:
+        if "message" in data["choices"][0]:
+            return data["choices"][0]["message"]["content"]
+        return data["choices"][0]["text"]
+    
+    return str(data)
+
+
+def _request_cache_key(req: Dict[str, Any], system_prompt: str, user_prompt: str) -> Optional[str]:
+    """Cache key for a built request, or None when caching is disabled."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    payload = req["payload"]
+    return cache_key(payload["model"], system_prompt, user_prompt, payload["temperature"])
+
+
+async def _admit(
+    endpoint: LLMEndpoint, system_prompt: str, user_prompt: str, options: Optional[GenerationOptions]
+) -> None:
+    """Wait for RPM/TPM budget before one provider request; raises LLMOverloaded (never the stub).
+
+    Called once per request actually sent, retries and hedges included, so a
+    retry after a provider 429 waits out the pause. A hedge to another
+    provider URL isn't counted against the primary's limits.
+    """
+    if not admission.enabled or endpoint.base_url != PRIMARY.base_url:
+        return
+    try:
+        await admission.acquire(estimate_tokens(system_prompt, user_prompt, options.max_tokens if options else None))
+    except AdmissionRejected as e:
+        # The request was never sent; free a half-open breaker's probe slot
+        endpoint.breaker.release()
+        raise LLMOverloaded(e) from e
+    except asyncio.CancelledError:
+        endpoint.breaker.release()
+        raise
+
+
+def _rate_limit_retry_after(error: BaseException) -> Optional[float]:
+    """For a provider 429: seconds from its Retry-After header (0 without one); None for anything else."""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) != 429:
+        return None
+    try:
+        return float(response.headers.get("retry-after", ""))
+    except ValueError:
+        return 0.0
+
+
+def _retry_delay(error: BaseException, attempt: int) -> float:
+    """Jittered backoff, but never sooner than a provider 429's Retry-After.
+
+    With admission control on, the 429 paused the buckets instead and the
+    retry waits for budget in the queue like any other request.
+    """
+    delay = backoff_delay(attempt, LLM_RETRY_BACKOFF, LLM_RETRY_BACKOFF_MAX)
+    if admission.enabled:
+        return delay
+    return max(delay, _rate_limit_retry_after(error) or 0.0)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Timeouts, transport errors, 429 and 5xx are worth another attempt; other 4xx are not."""
+    if isinstance(error, (CircuitOpenError, LLMUnavailable)):
+        return False
+    # httpx.HTTPStatusError and requests.HTTPError both carry the response
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return True
+
+
+def _record_outcome(endpoint: LLMEndpoint, error: Optional[BaseException], elapsed: float = 0.0) -> None:
+    if error is None:
+        endpoint.breaker.record_success()
+        endpoint.latency.observe(elapsed)
+        return
+    retry_after = _rate_limit_retry_after(error)
+    if retry_after is not None:
+        # Rate limited, not down: don't open the breaker for everyone. The provider's
+        # limit is tighter than our buckets think, so hold queued calls until it resets
+        endpoint.breaker.release()
+        if endpoint is PRIMARY and retry_after > 0:
+            admission.pause(retry_after)
+    elif _is_retryable(error):
+        endpoint.breaker.record_failure()
+    else:
+        # The provider answered; a bad request says nothing about its health
+        endpoint.breaker.release()
+
+
+def _fallback(
+    system_prompt: str, user_prompt: str, error: BaseException, options: Optional[GenerationOptions] = None
+) -> LLMResult:
+    """Serve the stub only when explicitly enabled; callers audit `result.fallback`."""
+    logger.error("LLM unavailable", extra={"error": repr(error), "stub_fallback": LLM_STUB_FALLBACK})
+    if not LLM_STUB_FALLBACK:
+        raise LLMUnavailable(str(error) or type(error).__name__) from error
+    return LLMResult(_get_stub_response(system_prompt, user_prompt, options), "fallback", repr(error))
+
+
+def llm_status() -> Dict[str, Any]:
+    """Breaker state and latency per endpoint, for GET /llm/status."""
+    return {
+        "configured": bool(LLM_API_KEY),
+        "stub_fallback": LLM_STUB_FALLBACK,
+        "primary": PRIMARY.status(),
+        "hedge": dict(HEDGE.status(), delay_seconds=PRIMARY.hedge_delay()) if HEDGE else None,
+        "templates": registry.active(),
+        "admission": admission.stats(),
+    }
+
+
+def _post_sync(
+    endpoint: LLMEndpoint, system_prompt: str, user_prompt: str, timeout: float, options: Optional[GenerationOptions]
+) -> str:
+    # Only the blocking path needs requests; keep it out of startup
+    import requests
+    
+    req = _build_request(system_prompt, user_prompt, endpoint, options)
+    start = time.perf_counter()
     try:
-        response = requests.post(LLM_BASE_URL, headers=headers, json=payload, timeout=10)
+        with span("llm", "chat"):
+            response = requests.post(endpoint.base_url, headers=req["headers"], json=req["payload"], timeout=timeout)
         response.raise_for_status()
-        data = response.json()
-        
-        if "choices" in data:
-            if "message" in data["choices"][0]:
-                return data["choices"][0]["message"]["content"]
-            return data["choices"][0]["text"]
+        content = _extract_content(response.json())
+    except Exception as e:
+        _record_outcome(endpoint, e)
+        raise
+    _record_outcome(endpoint, None, time.perf_counter() - start)
+    return content
+
+
+def chat(system_prompt: str, user_prompt: str, options: Optional[GenerationOptions] = None) -> str:
+    """Call LLM API with system and user prompts (blocking; retries but never hedges)."""
+    
+    if not LLM_API_KEY:
+        # Return stub responses for demo
+        return _get_stub_response(system_prompt, user_prompt, options)
+    
+    req = _build_request(system_prompt, user_prompt, options=options)
+    key = _request_cache_key(req, system_prompt, user_prompt)
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    deadline = time.monotonic() + LLM_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            if not PRIMARY.breaker.allow():
+                raise CircuitOpenError("primary circuit open")
+            content = _post_sync(
+                PRIMARY, system_prompt, user_prompt, min(LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic()), options
+            )
+            break
+        except Exception as e:
+            attempt += 1
+            delay = _retry_delay(e, attempt)
+            if not _is_retryable(e) or attempt > LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                return _fallback(system_prompt, user_prompt, e, options).text
+            time.sleep(delay)
+    
+    if key:
+        llm_cache.set(key, content)
+    return content
+
+
+async def _attempt(
+    endpoint: LLMEndpoint, system_prompt: str, user_prompt: str, timeout: float,
+    options: Optional[GenerationOptions], admitted: bool = False,
+) -> str:
+    """One request with its own deadline; the caller has already passed breaker.allow().
+
+    Waits for admission first unless the caller already did (`admitted`);
+    `timeout` covers only the request itself.
+    """
+    if not admitted:
+        await _admit(endpoint, system_prompt, user_prompt, options)
+    req = _build_request(system_prompt, user_prompt, endpoint, options)
+    start = time.perf_counter()
+    try:
+        with span("llm", "chat" if endpoint is PRIMARY else "chat_hedge"):
+            response = await asyncio.wait_for(
+                get_async_client().post(endpoint.base_url, headers=req["headers"], json=req["payload"]),
+                timeout,
+            )
+        response.raise_for_status()
+        content = _extract_content(response.json())
+    except asyncio.CancelledError:
+        endpoint.breaker.release()
+        raise
+    except Exception as e:
+        _record_outcome(endpoint, e)
+        raise
+    _record_outcome(endpoint, None, time.perf_counter() - start)
+    return content
+
+
+async def _hedged_call(
+    system_prompt: str, user_prompt: str, deadline: float, options: Optional[GenerationOptions]
+) -> Tuple[str, str]:
+    """Send to the primary; if it is slower than its p95, race a hedge and take the first answer."""
+    timeout = min(LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic())
+    if not PRIMARY.breaker.allow():
+        if HEDGE is not None and HEDGE.breaker.allow():
+            return await _attempt(HEDGE, system_prompt, user_prompt, timeout, options), HEDGE.name
+        raise CircuitOpenError("LLM circuit open")
+    
+    # Admitted before the hedge clock starts, so time queued for budget never triggers a hedge
+    await _admit(PRIMARY, system_prompt, user_prompt, options)
+    timeout = min(LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic())
+    primary = asyncio.create_task(_attempt(PRIMARY, system_prompt, user_prompt, timeout, options, admitted=True))
+    tasks = {primary: PRIMARY.name}
+    try:
+        if HEDGE is None:
+            return await primary, PRIMARY.name
+        done, _ = await asyncio.wait({primary}, timeout=min(PRIMARY.hedge_delay(), timeout))
+        if done or not HEDGE.breaker.allow():
+            return await primary, PRIMARY.name
         
-        return str(data)
+        hedge_timeout = min(LLM_ATTEMPT_TIMEOUT, deadline - time.monotonic())
+        tasks[asyncio.create_task(_attempt(HEDGE, system_prompt, user_prompt, hedge_timeout, options))] = HEDGE.name
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), tasks[task]
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def _dispatch(system_prompt: str, user_prompt: str, options: Optional[GenerationOptions]) -> Tuple[str, str]:
+    """Retry hedged calls with jittered backoff until they succeed or the deadline passes."""
+    deadline = time.monotonic() + LLM_DEADLINE
+    attempt = 0
+    while True:
+        try:
+            return await _hedged_call(system_prompt, user_prompt, deadline, options)
+        except Exception as e:
+            attempt += 1
+            delay = _retry_delay(e, attempt)
+            if not _is_retryable(e) or attempt > LLM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                raise
+            logger.warning("LLM attempt failed, retrying", extra={"attempt": attempt, "error": repr(e)})
+            await asyncio.sleep(delay)
+
+
+async def acomplete(
+    system_prompt: str, user_prompt: str, options: Optional[GenerationOptions] = None
+) -> LLMResult:
+    """Async completion through the dispatcher, reporting where the text came from.
+
+    `options` carries a template's model, temperature and max_tokens; a
+    RenderedPrompt unpacks straight into the three arguments. Raises
+    LLMUnavailable when the provider fails and LLM_STUB_FALLBACK is off, and
+    LLMOverloaded when admission control turns the call away.
+    """
+    
+    if not LLM_API_KEY:
+        return LLMResult(_get_stub_response(system_prompt, user_prompt, options), "stub")
+    
+    req = _build_request(system_prompt, user_prompt, options=options)
+    key = _request_cache_key(req, system_prompt, user_prompt)
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return LLMResult(cached, "cache")
+    
+    try:
+        content, source = await _dispatch(system_prompt, user_prompt, options)
+    except LLMOverloaded:
+        raise
     except Exception as e:
-        # Fallback to stub on error
-        return _get_stub_response(system_prompt, user_prompt)
+        return _fallback(system_prompt, user_prompt, e, options)
+    
+    if key:
+        llm_cache.set(key, content)
+    return LLMResult(content, source)
+
+
+async def achat(system_prompt: str, user_prompt: str, options: Optional[GenerationOptions] = None) -> str:
+    """Async variant of chat() that reuses pooled keep-alive connections."""
+    return (await acomplete(system_prompt, user_prompt, options)).text
+
 
+async def achat_stream(
+    system_prompt: str, user_prompt: str, options: Optional[GenerationOptions] = None,
+    meta: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """Yield completion text chunks as they arrive (OpenAI `stream: true`).
 
-def _get_stub_response(system_prompt: str, user_prompt: str) -> str:
-    """Return hardcoded stub responses for demo."""
+    If the stream fails before the first token, the request goes through the
+    non-streaming dispatcher instead. `meta["source"]` reports the LLMResult source.
+    """
+    meta = meta if meta is not None else {}
+    
+    if not LLM_API_KEY:
+        meta["source"] = "stub"
+        yield _get_stub_response(system_prompt, user_prompt, options)
+        return
+    
+    req = _build_request(system_prompt, user_prompt, options=options)
+    key = _request_cache_key(req, system_prompt, user_prompt)
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            meta["source"] = "cache"
+            yield cached
+            return
     
-    if "intake" in system_prompt.lower() or "intake" in user_prompt.lower():
-        return '''{
+    parts = []
+    if PRIMARY.breaker.allow():
+        await _admit(PRIMARY, system_prompt, user_prompt, options)
+        payload = dict(req["payload"], stream=True)
+        start = time.perf_counter()
+        try:
+            with span("llm", "chat_stream"):
+                async with get_async_client().stream(
+                    "POST", PRIMARY.base_url, headers=req["headers"], json=payload, timeout=LLM_ATTEMPT_TIMEOUT
+                ) as response:
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        choice = json.loads(data)["choices"][0]
+                        # Chat completions stream deltas; legacy completions stream text
+                        text = choice.get("delta", {}).get("content") or choice.get("text")
+                        if text:
+                            parts.append(text)
+                            yield text
+        except (asyncio.CancelledError, GeneratorExit):
+            PRIMARY.breaker.release()
+            raise
+        except Exception as e:
+            _record_outcome(PRIMARY, e)
+            if parts:
+                # The client already has partial output; don't splice in a different answer
+                raise LLMUnavailable(f"stream interrupted: {e!r}") from e
+        else:
+            _record_outcome(PRIMARY, None, time.perf_counter() - start)
+            meta["source"] = PRIMARY.name
+    
+    if parts:
+        if key:
+            llm_cache.set(key, "".join(parts))
+        return
+    
+    # Breaker open or the stream failed before the first token; the dispatcher admits its own requests
+    result = await acomplete(system_prompt, user_prompt, options)
+    meta["source"] = result.source
+    yield result.text
+
+
+def _get_stub_response(
+    system_prompt: str, user_prompt: str, options: Optional[GenerationOptions] = None
+) -> str:
+    """Return the canned demo response for the prompt's template.
+
+    The template comes from `options`, or is looked up by its static system
+    prompt when only the messages are known (bench.stub_llm).
+    """
+    if options is not None and options.template:
+        name = options.template.partition("@")[0]
+    else:
+        template = registry.for_system_prompt(system_prompt)
+        name = template.name if template else None
+    return _STUB_RESPONSES.get(name, "{}")
+
+
+_STUB_INTAKE = '''{
   "intake_structured": {
     "reason": "birth control consult",
     "age": 20,
@@ -75,9 +585,8 @@ def _get_stub_response(system_prompt: str, user_prompt: str) -> str:
   "provider_note": "Chief concern: Patient seeking birth control pill for contraception.\nKey history: 20 year old, non-smoker, no migraine with aura, low pregnancy risk.\nRed flags: None identified.\nPlan suggestion: Consider combination oral contraceptive pill given preferences and no contraindications.",
   "patient_summary": "We talked about your birth control options today. You are 20 years old and prefer a daily pill. You do not smoke and have no history of migraine with aura. Your risk of pregnancy right now is low. We discussed starting a combination birth control pill that you take once a day."
 }'''
-    
-    if "post visit" in system_prompt.lower() or "post visit" in user_prompt.lower():
-        return '''{
+
+_STUB_POST_VISIT = '''{
   "patient_summary": {
     "what_we_discussed": "We talked about starting you on a birth control pill. This pill contains hormones that prevent pregnancy. You will take one pill every day at the same time. It is important to take it every day to keep you protected.",
     "next_steps": [
@@ -93,5 +602,18 @@ def _get_stub_response(system_prompt: str, user_prompt: str) -> str:
   },
   "plain_text": "We talked about starting you on a birth control pill. This pill contains hormones that prevent pregnancy. You will take one pill every day at the same time. It is important to take it every day to keep you protected.\\n\\nNext steps:\\n- Start taking the pill tomorrow morning with your first meal\\n- Pick up your prescription at the pharmacy within 3 days\\n- Schedule a follow up in 3 months to check how you are doing\\n\\nWatch for:\\n- If you miss a pill, take it as soon as you remember\\n- If you have severe chest pain or leg swelling, call us right away\\n- If you have unusual bleeding that lasts more than a week, let us know"
 }'''
-    
-    return "{}"
+
+# No corrections: canned clinical values must never stand in for a patient's answers
+_STUB_INTAKE_REPAIR = "{}"
+
+_STUB_POST_VISIT_CHUNK = """- Discussed: starting a daily birth control pill; patient does not smoke and has no migraine with aura
+- Next steps: start the pill tomorrow morning, pick up the prescription within 3 days, follow up in 3 months
+- Warning signs: clinician said to call right away for severe chest pain or leg swelling, and to report bleeding that lasts more than a week"""
+
+_STUB_RESPONSES = {
+    INTAKE_PROMPT: _STUB_INTAKE,
+    INTAKE_REPAIR_PROMPT: _STUB_INTAKE_REPAIR,
+    POST_VISIT_PROMPT: _STUB_POST_VISIT,
+    POST_VISIT_NOTE_PROMPT: _STUB_POST_VISIT,
+    POST_VISIT_CHUNK_PROMPT: _STUB_POST_VISIT_CHUNK,
+}
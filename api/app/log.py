@@ -0,0 +1,111 @@
+"""Structured JSON logging through a non-blocking queue handler.
+
+Request handlers only enqueue log records; a background listener thread
+formats them and writes to stdout, so the request path never waits on the
+log sink.
+"""
+import sys
+import json
+import queue
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.metrics import request_id_var
+from app.settings import env
+
+LOG_LEVEL = env("LOG_LEVEL", "INFO").upper()
+# "json" for JSON lines, "text" for a human-readable single line
+LOG_FORMAT = env("LOG_FORMAT", "json").lower()
+# Fraction of verbose debug records (e.g. Whereby listings) that are kept
+LOG_DEBUG_SAMPLE_RATE = float(env("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+visit_id_var: ContextVar[Optional[str]] = ContextVar("visit_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "visit_id", "sampled"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_visit(visit_id: Optional[str]) -> None:
+    """Attach a visit id to every log record emitted in the current context."""
+    visit_id_var.set(visit_id)
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request and visit ids, and sample verbose ones."""
+
+    def __init__(self, sample_rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "sampled", False) and random.random() >= self.sample_rate:
+            return False
+        record.request_id = request_id_var.get()
+        record.visit_id = visit_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "visit_id", None):
+            entry["visit_id"] = record.visit_id
+        for key, value in vars(record).items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        ids = " ".join(
+            f"{key}={getattr(record, key)}" for key in ("request_id", "visit_id") if getattr(record, key, None)
+        )
+        line = f"{record.levelname:<7} {record.name}: {record.getMessage()}"
+        return f"{line} [{ids}]" if ids else line
+
+
+def configure_logging() -> None:
+    """Install the queue handler on the `app` logger (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.handlers.QueueHandler(log_queue)
+    # Filter on the producer side so request and visit ids are captured in the caller's context
+    handler.addFilter(ContextFilter())
+
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, sink, respect_handler_level=False)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
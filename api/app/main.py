@@ -1,22 +1,71 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import Text, and_, cast, or_, update
+from sqlalchemy.orm import Session, load_only
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import base64
 import json
+import uuid
 
-from app.db import get_db, init_db
-from app.models import Visit
+from app.db import get_db, init_db, SessionLocal
+from app.models import Visit, Job
 from app.schemas import (
     IntakeRequest, IntakeResponse,
+    IntakeBatchRequest, IntakeBatchResponse, IntakeBatchItemResult,
     RoomRequest, RoomResponse,
-    PostVisitRequest, PostVisitResponse,
+    PostVisitRequest,
     PharmacyRequest, PharmacyResponse,
-    VisitResponse
+    VisitResponse, VisitListResponse, JobAccepted, JobStatusResponse
 )
-from app.llm import chat
-from app.whereby import create_room, get_transcription
+from app.llm import acomplete, achat_stream, aclose_client, llm_status, LLMOverloaded, LLMUnavailable
+from app.cache import llm_cache
+from app.audit import record_event, record_events, load_audit_events
+from app.intake import build_intake_prompts, parse_intake_completion, intake_visit_values
+from app.extraction import JSONObjectScanner
+from app.metrics import RequestMetricsMiddleware, registry as metrics_registry
+from app.log import configure_logging, shutdown_logging, bind_visit
+from app.settings import env, env_flag
+from app.serialization import JSONBytesResponse, RawJSON, dumps_object
+from app.room_pool import acquire_room, room_pool
+from app.post_visit import (
+    fetch_transcription, prepare_post_visit_prompts, needs_condensing,
+    post_visit_result, apply_post_visit_result, post_visit_events
+)
+from app.jobs import active_job, enqueue, runner as job_runner, POST_VISIT_SUMMARY
+from app.write_behind import write_behind
+
+configure_logging()
+
+# Batch intake: LLM calls in flight at once, and visits written per transaction
+INTAKE_BATCH_CONCURRENCY = int(env("INTAKE_BATCH_CONCURRENCY", "16"))
+INTAKE_BATCH_CHUNK_SIZE = int(env("INTAKE_BATCH_CHUNK_SIZE", "100"))
+# GET /visit/{id}: copy JSON columns into the response as stored instead of decoding and re-encoding them
+VISIT_RESPONSE_RAW_JSON = env_flag("VISIT_RESPONSE_RAW_JSON", "false")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema work happens here rather than at import; it is one read once the database is current
+    init_db()
+    write_behind.start()
+    await job_runner.start()
+    await room_pool.start()
+    yield
+    await room_pool.stop()
+    await job_runner.stop()
+    # Commit whatever status and audit writes are still queued
+    write_behind.stop()
+    # Release pooled LLM connections on shutdown
+    await aclose_client()
+    shutdown_logging()
+
 
-app = FastAPI(title="ReproCare API")
+app = FastAPI(title="ReproCare API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,9 +73,75 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing"],
+)
+app.add_middleware(RequestMetricsMiddleware)
+
+
+def _visit_exists(db: Session, visit_id: str) -> bool:
+    """Primary-key probe that loads no columns."""
+    return db.query(Visit.id).filter(Visit.id == visit_id).first() is not None
+
+
+def _update_visit(db: Session, visit_id: str, values: Dict[str, Any]) -> bool:
+    """Single UPDATE ... WHERE id=? without loading the row; False if it doesn't exist.
+
+    Waits for the visit's queued write-behind updates first, so an older
+    queued status can never land on top of this one.
+    """
+    write_behind.barrier(visit_id)
+    updated = db.query(Visit).filter(Visit.id == visit_id).update(values, synchronize_session=False)
+    return updated > 0
+
+
+def _save_visit(db: Session, visit_id: str, values: Dict[str, Any], events: List[str]) -> bool:
+    """Commit _update_visit, then queue the audit events; False if the visit doesn't exist.
+
+    The data is durable on return; the events are group-committed by the
+    write-behind writer without waiting. Blocking from the barrier to the
+    commit; async handlers run it through run_in_threadpool.
+    """
+    if not _update_visit(db, visit_id, values):
+        db.rollback()
+        return False
+    db.commit()
+    write_behind.submit(db, visit_id, events=events)
+    # Only does work without a running writer, when submit wrote the events into this session
+    db.commit()
+    return True
+
+
+def _llm_unavailable(error: LLMUnavailable) -> HTTPException:
+    """503 when the provider is down; an admission rejection keeps its 429/503 and says when to retry."""
+    if isinstance(error, LLMOverloaded):
+        return HTTPException(
+            status_code=error.status_code,
+            detail="Too many LLM requests in flight, try again later",
+            headers={"Retry-After": str(error.retry_after)},
+        )
+    return HTTPException(status_code=503, detail="LLM unavailable, try again later")
+
+
+def _llm_error_event(error: LLMUnavailable) -> Dict[str, Any]:
+    """SSE `error` payload; carries retry_after when admission control turned the call away."""
+    if isinstance(error, LLMOverloaded):
+        return {"detail": "Too many LLM requests in flight, try again later", "retry_after": error.retry_after}
+    return {"detail": "LLM unavailable, try again later"}
+
+
+# Columns loaded for GET /visit/{id}; transcription_text and the legacy audit_events stay deferred
+VISIT_RESPONSE_LOAD_PLAN = load_only(
+    Visit.id, Visit.created_at, Visit.status, Visit.patient_profile, Visit.intake_raw,
+    Visit.intake_structured, Visit.provider_note, Visit.patient_summary,
+    Visit.video_room_id, Visit.pharmacy_request, Visit.intake_template, Visit.summary_template,
 )
 
-init_db()
+# The raw path reads these JSON columns as text; the other columns are selected as-is, in VisitResponse order
+VISIT_JSON_FIELDS = {"patient_profile", "intake_raw", "intake_structured", "pharmacy_request"}
+VISIT_RAW_COLUMNS = [
+    cast(getattr(Visit, name), Text).label(name) if name in VISIT_JSON_FIELDS else getattr(Visit, name)
+    for name in VisitResponse.model_fields if name != "audit_events"
+]
 
 
 @app.get("/")
@@ -59,176 +174,328 @@ def debug_env():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Per-route and per-dependency latency histograms in Prometheus text format."""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters for the LLM response cache."""
+    return llm_cache.stats()
+
+
+@app.get("/llm/status")
+def llm_status_endpoint():
+    """Circuit breaker state and recent latency for each LLM endpoint."""
+    return llm_status()
+
+
+@app.get("/room_pool/stats")
+def room_pool_stats():
+    """Ready rooms, hand-outs and misses for the Whereby room pool."""
+    return room_pool.stats()
+
+
 @app.post("/intake_to_json", response_model=IntakeResponse)
-def intake_to_json(request: IntakeRequest, db: Session = Depends(get_db)):
-    visit = db.query(Visit).filter(Visit.id == request.visit_id).first()
-    if not visit:
+async def intake_to_json(request: IntakeRequest, db: Session = Depends(get_db)):
+    bind_visit(request.visit_id)
+    # Database calls run in the threadpool: a busy SQLite write lock must not stall the event loop
+    if not await run_in_threadpool(_visit_exists, db, request.visit_id):
         raise HTTPException(status_code=404, detail="Visit not found")
     
-    # Format Q&A for LLM
-    qa_text = "\n".join([f"Q: {item.q}\nA: {item.a}" for item in request.qa])
+    prompt = build_intake_prompts(request.qa)
+    
+    # End the read transaction so the pooled DB connection isn't held while we await the LLM
+    await run_in_threadpool(db.rollback)
+    try:
+        result = await acomplete(*prompt)
+    except LLMUnavailable as e:
+        raise _llm_unavailable(e)
+    
+    # Prose or fences around the JSON are stripped; invalid fields get one targeted repair prompt
+    parsed = await parse_intake_completion(result.text)
     
-    system_prompt = """You convert short intake Q and A into JSON for a clinician and a patient.
-Follow the target schema. Unknown fields are null. Do not invent data."""
+    # Add audit events; a stub answer served because the provider failed is always recorded
+    events = ["llm_fallback", "intake_finished"] if result.fallback or parsed.fallback else ["intake_finished"]
+    # The barrier wait and the write transaction run off the event loop, start to commit
+    updated = await run_in_threadpool(_save_visit, db, request.visit_id, intake_visit_values(
+        request.qa, parsed.intake_structured, parsed.provider_note, parsed.patient_summary, prompt.template
+    ), events)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Visit not found")
+    
+    return IntakeResponse(
+        intake_structured=parsed.intake_structured,
+        provider_note=parsed.provider_note,
+        patient_summary=parsed.patient_summary,
+        events_added=events
+    )
 
-    user_prompt = f"""Convert the following Q and A into:
-1) intake_structured JSON with fields reason, age, last_period, pregnancy_risk, contra_indications, preferences, history, insurance
-2) provider_note with four lines: chief concern, key history, red flags, plan suggestion
-3) patient_summary at grade eight reading level with two short paragraphs
 
-Q and A:
-{qa_text}"""
+@app.post("/intake_to_json/batch", response_model=IntakeBatchResponse)
+async def intake_to_json_batch(request: IntakeBatchRequest, db: Session = Depends(get_db)):
+    """Convert many intakes with bounded LLM concurrency.
 
-    response_text = chat(system_prompt, user_prompt)
+    Results are written back in one transaction per chunk. Each item reports
+    `ok`, `fallback` (the completion could not be parsed, or it or its
+    repair was the stub), `unavailable` (the LLM failed or admission control
+    turned the call away; the visit is left untouched) or `not_found`.
+    """
+    ids = [item.visit_id for item in request.items]
     
-    try:
-        # Parse JSON response
-        parsed = json.loads(response_text)
-        intake_structured = parsed.get("intake_structured", {})
-        provider_note = parsed.get("provider_note", "")
-        patient_summary = parsed.get("patient_summary", "")
-    except:
-        # Fallback if JSON parsing fails
-        intake_structured = {}
-        provider_note = "Intake completed. Review patient responses."
-        patient_summary = "We reviewed your intake information."
-    
-    # Update visit
-    visit.intake_raw = [{"q": item.q, "a": item.a} for item in request.qa]
-    visit.intake_structured = intake_structured
-    visit.provider_note = provider_note
-    visit.patient_summary = patient_summary
-    visit.status = "intake_complete"
-    
-    # Add audit event
-    if not visit.audit_events:
-        visit.audit_events = []
-    visit.audit_events.append(f"intake_finished:{datetime.utcnow().isoformat()}")
+    def load_existing() -> set:
+        existing = {row.id for row in db.query(Visit.id).filter(Visit.id.in_(ids))}
+        db.rollback()
+        return existing
     
-    db.commit()
+    existing = await run_in_threadpool(load_existing)
     
-    return IntakeResponse(
-        intake_structured=intake_structured,
-        provider_note=provider_note,
-        patient_summary=patient_summary,
-        events_added=["intake_finished"]
+    semaphore = asyncio.Semaphore(INTAKE_BATCH_CONCURRENCY)
+    
+    stub_served = set()
+    
+    async def convert(item: IntakeRequest) -> IntakeBatchItemResult:
+        prompt = build_intake_prompts(item.qa)
+        try:
+            async with semaphore:
+                result = await acomplete(*prompt)
+                # A repair prompt counts against the same concurrency limit
+                parsed = await parse_intake_completion(result.text)
+        except LLMUnavailable:
+            return IntakeBatchItemResult(visit_id=item.visit_id, status="unavailable")
+        fallback = result.fallback or parsed.fallback
+        if fallback:
+            stub_served.add(item.visit_id)
+        return IntakeBatchItemResult(
+            visit_id=item.visit_id,
+            status="ok" if parsed.parsed and not fallback else "fallback",
+            intake_structured=parsed.intake_structured,
+            provider_note=parsed.provider_note,
+            patient_summary=parsed.patient_summary,
+            template=prompt.template,
+        )
+    
+    def write_chunk(written: List[Tuple[IntakeRequest, IntakeBatchItemResult]]) -> None:
+        db.execute(update(Visit), [
+            {"id": item.visit_id, **intake_visit_values(
+                item.qa, result.intake_structured, result.provider_note, result.patient_summary, result.template
+            )}
+            for item, result in written
+        ])
+        record_events(db, [(item.visit_id, "llm_fallback", None) for item, _ in written if item.visit_id in stub_served])
+        record_events(db, [(item.visit_id, "intake_finished", None) for item, _ in written])
+        db.commit()
+    
+    results: List[IntakeBatchItemResult] = []
+    for start in range(0, len(request.items), INTAKE_BATCH_CHUNK_SIZE):
+        chunk = [item for item in request.items[start:start + INTAKE_BATCH_CHUNK_SIZE] if item.visit_id in existing]
+        converted = await asyncio.gather(*[convert(item) for item in chunk])
+        written = [(item, result) for item, result in zip(chunk, converted) if result.status != "unavailable"]
+        
+        # One bulk UPDATE by primary key plus one executemany for the events, off the event loop
+        if written:
+            await run_in_threadpool(write_chunk, written)
+        
+        by_id = {result.visit_id: result for result in converted}
+        for item in request.items[start:start + INTAKE_BATCH_CHUNK_SIZE]:
+            results.append(by_id.get(item.visit_id) or IntakeBatchItemResult(visit_id=item.visit_id, status="not_found"))
+    
+    return IntakeBatchResponse(
+        results=results,
+        succeeded=sum(1 for r in results if r.status == "ok"),
+        fallback=sum(1 for r in results if r.status == "fallback"),
+        unavailable=sum(1 for r in results if r.status == "unavailable"),
+        not_found=sum(1 for r in results if r.status == "not_found"),
     )
 
 
 @app.post("/create_room", response_model=RoomResponse)
 def create_room_endpoint(request: RoomRequest, db: Session = Depends(get_db)):
-    visit = db.query(Visit).filter(Visit.id == request.visit_id).first()
-    if not visit:
+    bind_visit(request.visit_id)
+    # Check first so an unknown visit never costs a room
+    if not _visit_exists(db, request.visit_id):
         raise HTTPException(status_code=404, detail="Visit not found")
     
-    room_data = create_room()
-    
-    visit.video_room_id = room_data["room_id"]
-    visit.status = "visit_started"
+    # Pre-created rooms come from the pool; the meetings API is only called when it is empty
+    room_data = acquire_room()
     
-    if not visit.audit_events:
-        visit.audit_events = []
-    visit.audit_events.append(f"visit_started:{datetime.utcnow().isoformat()}")
+    # Status transition and audit event are group-committed by the write-behind writer; the
+    # barrier makes the room id durable before we answer, as the summary job needs it. End the
+    # read transaction first, so waiting requests never hold the pool connections the writer needs
+    db.rollback()
+    write_behind.submit(db, request.visit_id, {
+        "video_room_id": room_data["room_id"],
+        "status": "visit_started",
+    }, events=["visit_started"])
+    if not write_behind.barrier(request.visit_id):
+        raise HTTPException(status_code=503, detail="Room could not be saved, try again")
     
     db.commit()
     
     return RoomResponse(**room_data)
 
 
-@app.post("/post_visit_explain", response_model=PostVisitResponse)
+@app.post("/post_visit_explain", response_model=JobAccepted, status_code=202)
 def post_visit_explain(request: PostVisitRequest, db: Session = Depends(get_db)):
-    visit = db.query(Visit).filter(Visit.id == request.visit_id).first()
-    if not visit:
+    """Queue transcript retrieval and summary generation for the visit."""
+    bind_visit(request.visit_id)
+    if not _visit_exists(db, request.visit_id):
         raise HTTPException(status_code=404, detail="Visit not found")
     
-    # Try to get transcription from the meeting
-    transcription_text = None
-    if visit.video_room_id:
-        print(f"Attempting to fetch transcription for room: {visit.video_room_id}")
-        transcription_text = get_transcription(visit.video_room_id)
-        if transcription_text:
-            visit.transcription_text = transcription_text
-            print(f"✓ Successfully retrieved transcription ({len(transcription_text)} characters)")
-        else:
-            print(f"⚠ No transcription available - will use provider note instead")
-            print(f"   To enable transcriptions:")
-            print(f"   1. Go to Whereby room settings (https://subdomain.whereby.com/rooms)")
-            print(f"   2. Edit room template: {visit.video_room_id}")
-            print(f"   3. Enable 'Live transcription' or 'Transcription' feature")
-            print(f"   4. Save and use the room again")
-    
-    system_prompt = """You write simple patient explanations. Reading level grade eight. Use short sentences."""
-
-    # Build the prompt with transcription if available, otherwise use provider note
-    if transcription_text:
-        user_prompt = f"""Create a three part summary based on the actual meeting transcription:
-one, what we talked about during the visit.
-two, what to do next with any dates mentioned.
-three, what to watch for and when to get help.
-
-Meeting transcription:
-{transcription_text[:4000]}"""  # Limit to avoid token limits
-        print("Using transcription for summary generation")
-    else:
-        user_prompt = f"""Create a three part summary:
-one, what we talked about.
-two, what to do next with any dates.
-three, what to watch for and when to get help.
-
-Provider note:
-{request.provider_note}
-
-Intake structured JSON:
-{json.dumps(request.intake_structured)}"""
-        print("Using provider note and intake data (no transcription available)")
-
-    response_text = chat(system_prompt, user_prompt)
-    
-    try:
-        parsed = json.loads(response_text)
-        patient_summary = parsed.get("patient_summary", {})
-        plain_text = parsed.get("plain_text", "")
-    except:
-        patient_summary = {
-            "what_we_discussed": "We discussed your birth control options.",
-            "next_steps": ["Follow up as recommended"],
-            "watch_fors": ["Contact us if you have concerns"]
-        }
-        plain_text = "We discussed your birth control options. Follow up as recommended. Contact us if you have concerns."
-    
-    visit.patient_summary = plain_text
-    visit.status = "summary_ready"
-    
-    if not visit.audit_events:
-        visit.audit_events = []
-    visit.audit_events.append(f"summary_ready:{datetime.utcnow().isoformat()}")
+    # A repeated request while the summary is still pending gets the job already under way
+    job = active_job(db, POST_VISIT_SUMMARY, request.visit_id)
+    if job:
+        return JobAccepted(job_id=job.id, status=job.status)
     
+    # The job reads video_room_id and sets the status; let queued room writes land first,
+    # without holding a pool connection the writer needs
+    db.rollback()
+    write_behind.barrier(request.visit_id)
+    job = enqueue(db, POST_VISIT_SUMMARY, request.visit_id, {
+        "provider_note": request.provider_note,
+        "intake_structured": request.intake_structured,
+    })
     db.commit()
+    job_runner.notify()
     
-    return PostVisitResponse(
-        patient_summary=patient_summary,
-        plain_text=plain_text
+    return JobAccepted(job_id=job.id, status=job.status)
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return JobStatusResponse(
+        id=job.id,
+        kind=job.kind,
+        visit_id=job.visit_id,
+        status=job.status,
+        stage=job.stage,
+        attempts=job.attempts,
+        error=job.error,
+        result=job.result,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        next_run_at=job.next_run_at if job.status in ("queued", "retrying") else None
     )
 
 
-@app.post("/pharmacy_order", response_model=PharmacyResponse)
-def pharmacy_order(request: PharmacyRequest, db: Session = Depends(get_db)):
-    visit = db.query(Visit).filter(Visit.id == request.visit_id).first()
-    if not visit:
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/post_visit_explain/{visit_id}/stream")
+async def post_visit_explain_stream(visit_id: str, db: Session = Depends(get_db)):
+    """Stream the post-visit summary as SSE while the LLM generates it.
+
+    Emits `status` events for each stage, a `token` event per completion
+    chunk, and a final `done` event carrying the PostVisitResponse.
+    """
+    bind_visit(visit_id)
+    
+    def load_visit() -> Optional[Tuple[Optional[str], Optional[str], str, Dict[str, Any]]]:
+        write_behind.barrier(visit_id)
+        visit = (
+            db.query(Visit)
+            .options(load_only(Visit.video_room_id, Visit.transcription_id, Visit.provider_note, Visit.intake_structured))
+            .filter(Visit.id == visit_id)
+            .first()
+        )
+        loaded = (
+            visit.video_room_id, visit.transcription_id, visit.provider_note or "", visit.intake_structured or {}
+        ) if visit else None
+        db.rollback()
+        return loaded
+    
+    # The barrier wait and the read run in the threadpool, off the event loop
+    loaded = await run_in_threadpool(load_visit)
+    if loaded is None:
         raise HTTPException(status_code=404, detail="Visit not found")
+    video_room_id, pinned_transcription_id, provider_note, intake_structured = loaded
     
-    order_id = f"stub-{visit.id[:8]}"
+    async def events():
+        yield _sse("status", {"stage": "fetching_transcript"})
+        transcription_text = transcription_id = None
+        if video_room_id:
+            transcription_text, transcription_id = await fetch_transcription(video_room_id, pinned_transcription_id)
+        
+        try:
+            if needs_condensing(transcription_text):
+                yield _sse("status", {"stage": "condensing_transcript"})
+            prompt, chunk_fallback = await prepare_post_visit_prompts(
+                transcription_text, provider_note, intake_structured,
+                transcription_id,
+            )
+        except LLMUnavailable as e:
+            yield _sse("error", _llm_error_event(e))
+            return
+        yield _sse("status", {"stage": "generating"})
+        
+        # The JSON object is located while tokens arrive, not by re-scanning the whole completion
+        scanner = JSONObjectScanner()
+        meta: Dict[str, Any] = {}
+        try:
+            async for token in achat_stream(*prompt, meta=meta):
+                scanner.feed(token)
+                yield _sse("token", {"text": token})
+        except LLMUnavailable as e:
+            yield _sse("error", _llm_error_event(e))
+            return
+        scanner.close()
+        result = post_visit_result(scanner)
+        
+        def save_summary() -> None:
+            # The request-scoped session may already be closed once streaming starts
+            stream_db = SessionLocal()
+            try:
+                stream_visit = (
+                    stream_db.query(Visit).options(load_only(Visit.id)).filter(Visit.id == visit_id).first()
+                )
+                if stream_visit:
+                    if transcription_id and transcription_id != pinned_transcription_id:
+                        stream_visit.transcription_id = transcription_id
+                    apply_post_visit_result(stream_db, stream_visit, result, prompt.template)
+                    stream_db.commit()
+                    # Audit events are group-committed by the writer; the summary itself is already durable
+                    fallback = chunk_fallback or meta.get("source") == "fallback"
+                    write_behind.submit(stream_db, visit_id, events=post_visit_events(fallback))
+                    stream_db.commit()
+            finally:
+                stream_db.close()
+        
+        await run_in_threadpool(save_summary)
+        yield _sse("done", result.model_dump())
     
-    visit.pharmacy_request = {
-        "shipping": request.shipping,
-        "plan": request.plan,
-        "order_id": order_id
-    }
-    visit.status = "pharmacy_created"
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/pharmacy_order", response_model=PharmacyResponse)
+def pharmacy_order(request: PharmacyRequest, db: Session = Depends(get_db)):
+    bind_visit(request.visit_id)
+    order_id = f"stub-{request.visit_id[:8]}"
     
-    if not visit.audit_events:
-        visit.audit_events = []
-    visit.audit_events.append(f"pharmacy_created:{datetime.utcnow().isoformat()}")
+    # Durable before we answer: _update_visit waits out queued writes, then this commits synchronously
+    updated = _update_visit(db, request.visit_id, {
+        "pharmacy_request": {
+            "shipping": request.shipping,
+            "plan": request.plan,
+            "order_id": order_id
+        },
+        "status": "pharmacy_created",
+    })
+    if not updated:
+        raise HTTPException(status_code=404, detail="Visit not found")
+    
+    record_event(db, request.visit_id, "pharmacy_created")
     
     db.commit()
     
@@ -240,11 +507,18 @@ def pharmacy_order(request: PharmacyRequest, db: Session = Depends(get_db)):
 
 @app.get("/visit/{visit_id}", response_model=VisitResponse)
 def get_visit(visit_id: str, db: Session = Depends(get_db)):
-    visit = db.query(Visit).filter(Visit.id == visit_id).first()
+    bind_visit(visit_id)
+    # Read-your-writes: only waits when this visit has queued write-behind updates
+    write_behind.barrier(visit_id)
+    if VISIT_RESPONSE_RAW_JSON:
+        return _get_visit_raw(db, visit_id)
+    
+    visit = db.query(Visit).options(VISIT_RESPONSE_LOAD_PLAN).filter(Visit.id == visit_id).first()
     if not visit:
         raise HTTPException(status_code=404, detail="Visit not found")
     
-    return VisitResponse(
+    # Values come straight from our own columns, so skip validation; FastAPI serializes the model as-is
+    return VisitResponse.model_construct(
         id=visit.id,
         created_at=visit.created_at,
         status=visit.status,
@@ -255,20 +529,108 @@ def get_visit(visit_id: str, db: Session = Depends(get_db)):
         patient_summary=visit.patient_summary,
         video_room_id=visit.video_room_id,
         pharmacy_request=visit.pharmacy_request,
-        audit_events=visit.audit_events
+        intake_template=visit.intake_template,
+        summary_template=visit.summary_template,
+        audit_events=load_audit_events(db, visit.id)
     )
 
 
+def _get_visit_raw(db: Session, visit_id: str) -> JSONBytesResponse:
+    """GET /visit/{id} body built from column text, with no JSON decode or model validation."""
+    row = db.query(*VISIT_RAW_COLUMNS).filter(Visit.id == visit_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Visit not found")
+    items = [
+        (name, RawJSON(value) if name in VISIT_JSON_FIELDS else value)
+        for name, value in row._mapping.items()
+    ]
+    items.append(("audit_events", load_audit_events(db, visit_id)))
+    return JSONBytesResponse(dumps_object(items))
+
+
+# Columns that can be projected in list views; transcription_text, intake_raw and
+# the legacy audit_events blob are deliberately left out
+VISIT_LIST_FIELDS = {
+    "id", "created_at", "status", "patient_profile", "intake_structured",
+    "provider_note", "patient_summary", "video_room_id", "pharmacy_request",
+    "intake_template", "summary_template",
+}
+VISIT_LIST_DEFAULT_FIELDS = "id,created_at,status"
+VISIT_LIST_MAX_LIMIT = 200
+
+
+def _encode_cursor(created_at: datetime, visit_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{visit_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw_ts, visit_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(raw_ts), visit_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/visits", response_model=VisitListResponse)
+def list_visits(
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    fields: str = VISIT_LIST_DEFAULT_FIELDS,
+    limit: int = Query(50, ge=1, le=VISIT_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """List visits newest first with keyset pagination.
+
+    Pass the returned `next_cursor` back as `cursor` for the next page.
+    `fields` is a comma-separated projection; only those columns are loaded.
+    """
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(requested) - VISIT_LIST_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown or unlisted fields: {', '.join(sorted(unknown))}")
+    # id and created_at are always loaded to build the cursor; id is always returned
+    columns = ["id", "created_at"] + [f for f in requested if f not in ("id", "created_at")]
+    
+    query = db.query(*[getattr(Visit, name) for name in columns])
+    if status:
+        query = query.filter(Visit.status == status)
+    if created_after:
+        query = query.filter(Visit.created_at >= created_after)
+    if created_before:
+        query = query.filter(Visit.created_at < created_before)
+    if cursor:
+        cursor_ts, cursor_id = _decode_cursor(cursor)
+        query = query.filter(or_(
+            Visit.created_at < cursor_ts,
+            and_(Visit.created_at == cursor_ts, Visit.id < cursor_id),
+        ))
+    
+    # Fetch one extra row to know whether there is another page
+    rows = query.order_by(Visit.created_at.desc(), Visit.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = _encode_cursor(last.created_at, last.id)
+    
+    items = [
+        {name: row._mapping[name] for name in columns if name == "id" or name in requested}
+        for row in page
+    ]
+    return VisitListResponse(items=items, next_cursor=next_cursor)
+
+
 @app.post("/visit")
 def create_visit(db: Session = Depends(get_db)):
-    visit = Visit()
-    db.add(visit)
-    db.commit()
-    db.refresh(visit)
-    
-    if not visit.audit_events:
-        visit.audit_events = []
-    visit.audit_events.append(f"visit_created:{datetime.utcnow().isoformat()}")
+    # A single INSERT, group-committed with concurrent creations; the barrier makes it durable before we answer
+    visit_id = str(uuid.uuid4())
+    write_behind.submit(db, visit_id, events=["visit_created"], create=True)
+    if not write_behind.barrier(visit_id):
+        raise HTTPException(status_code=503, detail="Visit could not be saved, try again")
     db.commit()
     
-    return {"visit_id": visit.id}
+    return {"visit_id": visit_id}
@@ -0,0 +1,272 @@
+"""Lightweight latency spans, histograms and a Prometheus text exporter."""
+import time
+import uuid
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds in seconds; the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Request id and the spans recorded while serving it (shared with threadpool calls)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+request_spans_var: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram."""
+
+    __slots__ = ("counts", "total", "count", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        index = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self.counts), self.total, self.count
+
+    @staticmethod
+    def quantile(counts: List[int], count: int, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if count == 0:
+            return 0.0
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-1]
+
+
+class Counter:
+    """Monotonic event count."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    """Current value that goes up and down, e.g. a queue depth."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+
+class Registry:
+    """Histograms, counters and gauges keyed by metric name and label values."""
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Counter] = {}
+        self._gauges: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Gauge] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        key = (name, tuple(sorted(labels.items())))
+        counter = self._counters.get(key)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.setdefault(key, Counter())
+        return counter
+
+    def gauge(self, name: str, **labels: str) -> Gauge:
+        key = (name, tuple(sorted(labels.items())))
+        gauge = self._gauges.get(key)
+        if gauge is None:
+            with self._lock:
+                gauge = self._gauges.setdefault(key, Gauge())
+        return gauge
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            _dependency_histograms.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition (version 0.0.4)."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+
+        lines = []
+        described = set()
+        for (name, labels), histogram in items:
+            counts, total, count = histogram.snapshot()
+            if name not in described:
+                described.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            cumulative = 0
+            for index, bucket_count in enumerate(counts):
+                cumulative += bucket_count
+                le = "+Inf" if index == len(BUCKETS) else repr(BUCKETS[index])
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+
+        # Percentile estimates so p50/p95/p99 are readable without a Prometheus server
+        for name in sorted(described):
+            lines.append(f"# TYPE {name}_quantile gauge")
+        for (name, labels), histogram in items:
+            counts, _, count = histogram.snapshot()
+            for q in QUANTILES:
+                value = Histogram.quantile(counts, count, q)
+                lines.append(f"{name}_quantile{_labels(labels, quantile=str(q))} {value}")
+
+        described = set()
+        for (name, labels), counter in counters:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_labels(labels)} {counter.value}")
+
+        described = set()
+        for (name, labels), gauge in gauges:
+            if name not in described:
+                described.add(name)
+                lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_labels(labels)} {gauge.value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+REQUEST_METRIC = "reprocare_request_duration_seconds"
+DEPENDENCY_METRIC = "reprocare_dependency_duration_seconds"
+
+
+# Fast path for span(): skip label sorting on every observation
+_dependency_histograms: Dict[Tuple[str, str], Histogram] = {}
+
+
+def observe(dependency: str, operation: str, seconds: float) -> None:
+    """Record one dependency call and attach it to the current request, if any."""
+    histogram = _dependency_histograms.get((dependency, operation))
+    if histogram is None:
+        histogram = registry.histogram(DEPENDENCY_METRIC, dependency=dependency, operation=operation)
+        _dependency_histograms[(dependency, operation)] = histogram
+    histogram.observe(seconds)
+    spans = request_spans_var.get()
+    if spans is not None:
+        spans.append((f"{dependency}.{operation}", seconds))
+
+
+class span:
+    """Time a block as a dependency call: `with span("llm", "chat"): ...`"""
+
+    __slots__ = ("dependency", "operation", "start")
+
+    def __init__(self, dependency: str, operation: str):
+        self.dependency = dependency
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.dependency, self.operation, time.perf_counter() - self.start)
+        return False
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware: request ids, per-route latency and a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        spans: List[Tuple[str, float]] = []
+        id_token = request_id_var.set(request_id)
+        spans_token = request_spans_var.set(spans)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode(), request_id.encode("latin-1")))
+                if spans:
+                    timing = ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans)
+                    headers.append((b"server-timing", timing.encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            registry.histogram(
+                REQUEST_METRIC, method=scope["method"], route=path, status=str(status["code"])
+            ).observe(time.perf_counter() - start)
+            request_id_var.reset(id_token)
+            request_spans_var.reset(spans_token)
@@ -0,0 +1,26 @@
+"""Apply or inspect schema migrations.
+
+    python -m app.migrate            # apply pending migrations
+    python -m app.migrate status     # show applied and pending steps
+"""
+import sys
+
+from app.db import engine
+from app.migrations import LATEST_VERSION, MIGRATIONS, current_version, pending, upgrade
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        waiting = {migration.version for migration in pending(engine)}
+        print(f"Schema version: {current_version(engine)} (latest {LATEST_VERSION})")
+        for migration in MIGRATIONS:
+            state = "pending" if migration.version in waiting else "applied"
+            print(f"  {migration.version:3d}  {state:8s}  {migration.name}")
+    elif command == "upgrade":
+        applied = upgrade(engine)
+        for migration in applied:
+            print(f"Applied {migration.version}: {migration.name}")
+        print(f"Schema at version {LATEST_VERSION}.")
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,181 @@
+"""Numbered schema migrations, applied in order and recorded in schema_version.
+
+Each step runs once per database and must be idempotent: step 1 creates any
+missing tables from the current models, so later steps may find their change
+already in place on a new database. Append new steps; never renumber or edit
+one that has shipped.
+"""
+import logging
+from typing import Callable, List, NamedTuple, Optional, Set
+from sqlalchemy import inspect, null, select, func, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.models import Base, SchemaVersion, Visit
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key held while migrating, so concurrent workers queue behind one runner
+PG_MIGRATION_LOCK_KEY = 7_310_412_001
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], Optional[int]]
+
+
+def _column_names(conn: Connection, table: str) -> Set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+
+
+def _add_visit_transcription_text(conn: Connection) -> None:
+    if "transcription_text" not in _column_names(conn, "visit"):
+        conn.execute(text("ALTER TABLE visit ADD COLUMN transcription_text TEXT"))
+
+
+def _create_visit_indexes(conn: Connection) -> None:
+    # create_all only indexes tables it creates itself
+    for index in Visit.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
+
+def _move_audit_events(conn: Connection, batch_size: int = 500) -> int:
+    """Copy legacy JSON audit_events into visit_event rows and clear the column."""
+    from app.audit import parse_legacy_event, record_events
+
+    with Session(bind=conn) as db:
+        rows = db.query(Visit.id, Visit.audit_events).filter(Visit.audit_events.isnot(None)).yield_per(batch_size)
+        events = []
+        for visit_id, audit_events in rows:
+            for entry in audit_events or []:
+                event_type, ts = parse_legacy_event(entry)
+                events.append((visit_id, event_type, ts))
+        migrated = record_events(db, events)
+        db.query(Visit).update({Visit.audit_events: null()}, synchronize_session=False)
+        db.flush()
+    return migrated
+
+
+def _move_transcripts(conn: Connection, batch_size: int = 200) -> int:
+    """Compress legacy transcription_text values into the transcript table and clear the column.
+
+    The Whereby transcriptionId was never stored, so rows are keyed `legacy:<visit id>`.
+    """
+    from app.transcripts import put
+
+    migrated = 0
+    with Session(bind=conn) as db:
+        ids = [visit_id for visit_id, in db.query(Visit.id).filter(Visit.transcription_text.isnot(None))]
+        # Load the raw text a batch at a time so large tables don't sit in memory at once
+        for start in range(0, len(ids), batch_size):
+            rows = (
+                db.query(Visit.id, Visit.video_room_id, Visit.transcription_text)
+                .filter(Visit.id.in_(ids[start:start + batch_size]))
+                .all()
+            )
+            for visit_id, room_name, transcription_text in rows:
+                put(db, f"legacy:{visit_id}", room_name, transcription_text)
+                migrated += 1
+            db.flush()
+        db.query(Visit).update({Visit.transcription_text: null()}, synchronize_session=False)
+        db.flush()
+    return migrated
+
+
+def _add_visit_prompt_templates(conn: Connection) -> None:
+    columns = _column_names(conn, "visit")
+    for column in ("intake_template", "summary_template"):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE visit ADD COLUMN {column} VARCHAR"))
+
+
+def _add_visit_transcription_id(conn: Connection) -> None:
+    """Add visit.transcription_id and point visits at the legacy transcripts moved in step 5."""
+    if "transcription_id" not in _column_names(conn, "visit"):
+        conn.execute(text("ALTER TABLE visit ADD COLUMN transcription_id VARCHAR"))
+    conn.execute(text(
+        "UPDATE visit SET transcription_id = 'legacy:' || id WHERE transcription_id IS NULL "
+        "AND EXISTS (SELECT 1 FROM transcript WHERE transcript.transcription_id = 'legacy:' || visit.id)"
+    ))
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create tables", _create_tables),
+    Migration(2, "add visit.transcription_text", _add_visit_transcription_text),
+    Migration(3, "add visit indexes", _create_visit_indexes),
+    Migration(4, "move visit.audit_events into visit_event", _move_audit_events),
+    Migration(5, "move visit.transcription_text into transcript", _move_transcripts),
+    Migration(6, "add visit.intake_template and visit.summary_template", _add_visit_prompt_templates),
+    Migration(7, "add visit.transcription_id", _add_visit_transcription_id),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(engine: Engine) -> Optional[int]:
+    """Highest applied version (one primary-key read), or None for a new or pre-versioning database."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(func.max(SchemaVersion.version))).scalar()
+    except DBAPIError:
+        return None
+
+
+def _applied_versions(conn: Connection) -> Set[int]:
+    SchemaVersion.__table__.create(bind=conn, checkfirst=True)
+    return set(conn.execute(select(SchemaVersion.version)).scalars())
+
+
+def _lock(conn: Connection) -> None:
+    """Serialize runners: the first worker migrates, the others wait and then find nothing to do."""
+    if conn.dialect.name == "sqlite":
+        # Takes the write lock up front; other connections wait up to the busy timeout
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PG_MIGRATION_LOCK_KEY})
+
+
+def pending(engine: Engine) -> List[Migration]:
+    with engine.connect() as conn:
+        try:
+            applied = set(conn.execute(select(SchemaVersion.version)).scalars())
+        except DBAPIError:
+            applied = set()
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+def upgrade(engine: Engine) -> List[Migration]:
+    """Apply pending migrations in one locked transaction; returns the steps this call applied.
+
+    A database already at LATEST_VERSION costs a single read. Otherwise the
+    lock is taken and the applied set is re-read under it, so workers that
+    start together never run the same step twice.
+    """
+    if current_version(engine) == LATEST_VERSION:
+        return []
+
+    applied_now = []
+    with engine.connect() as conn:
+        _lock(conn)
+        applied = _applied_versions(conn)
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            count = migration.apply(conn)
+            conn.execute(SchemaVersion.__table__.insert().values(version=migration.version))
+            logger.info(
+                "Applied migration",
+                extra={"version": migration.version, "migration": migration.name, "rows": count},
+            )
+            applied_now.append(migration)
+        conn.commit()
+
+    if applied_now:
+        logger.info("Database schema ready", extra={"schema_version": LATEST_VERSION})
+    return applied_now
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Text, JSON
+from sqlalchemy import Column, String, DateTime, Text, JSON, Integer, Index, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import deferred
 from datetime import datetime
 import uuid
 
@@ -12,12 +13,80 @@ class Visit(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     created_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="created")
-    patient_profile = Column(JSON, nullable=True)
-    intake_raw = Column(JSON, nullable=True)
-    intake_structured = Column(JSON, nullable=True)
+    # Heavy columns are deferred: they load only when accessed or named in a query's load plan
+    patient_profile = deferred(Column(JSON, nullable=True))
+    intake_raw = deferred(Column(JSON, nullable=True))
+    intake_structured = deferred(Column(JSON, nullable=True))
     provider_note = Column(Text, nullable=True)
     patient_summary = Column(Text, nullable=True)
     video_room_id = Column(String, nullable=True)
-    transcription_text = Column(Text, nullable=True)
-    pharmacy_request = Column(JSON, nullable=True)
-    audit_events = Column(JSON, default=list)
+    # Whereby transcriptionId of this visit's meeting, kept once resolved (rooms can be shared)
+    transcription_id = Column(String, nullable=True)
+    # Legacy; transcripts now live compressed in the transcript table
+    transcription_text = deferred(Column(Text, nullable=True))
+    pharmacy_request = deferred(Column(JSON, nullable=True))
+    # Prompt template ids (name@version, see app.prompts) behind the intake and the summary
+    intake_template = Column(String, nullable=True)
+    summary_template = Column(String, nullable=True)
+    # Legacy event list; events now live in visit_event and this is only read by a migration
+    audit_events = deferred(Column(JSON, nullable=True))
+
+    __table_args__ = (
+        # Clinician queue: "status X, newest first" and the unfiltered newest-first listing
+        Index("ix_visit_status_created_at", "status", "created_at"),
+        Index("ix_visit_created_at", "created_at"),
+    )
+
+
+class SchemaVersion(Base):
+    """One row per applied app.migrations step."""
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True)
+
+
+class VisitEvent(Base):
+    __tablename__ = "visit_event"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    visit_id = Column(String, ForeignKey("visit.id"), nullable=False)
+    event_type = Column(String, nullable=False)
+    ts = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_visit_event_visit_id_ts", "visit_id", "ts"),)
+
+
+class Job(Base):
+    __tablename__ = "job"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String, nullable=False)
+    visit_id = Column(String, index=True, nullable=True)
+    status = Column(String, default="queued")
+    stage = Column(String, nullable=True)
+    attempts = Column(Integer, default=0)
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    next_run_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_job_status_next_run_at", "status", "next_run_at"),)
+
+
+class Transcript(Base):
+    """Whereby transcripts by transcriptionId, compressed and kept out of the visit table."""
+    __tablename__ = "transcript"
+
+    transcription_id = Column(String, primary_key=True)
+    room_name = Column(String, nullable=True)
+    state = Column(String, nullable=False)
+    etag = Column(String, nullable=True)
+    codec = Column(String, nullable=False, default="zlib")
+    content = deferred(Column(LargeBinary, nullable=True))
+    size = Column(Integer, nullable=True)
+    compressed_size = Column(Integer, nullable=True)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_transcript_room_name_fetched_at", "room_name", "fetched_at"),)
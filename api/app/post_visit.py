@@ -0,0 +1,210 @@
+"""Post-visit summary pipeline shared by the API endpoints and background jobs."""
+from fastapi.concurrency import run_in_threadpool
+import asyncio
+import logging
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+import json
+
+from app.cache import LLMCache, DiskCache, LLM_CACHE_PATH
+from app.chunking import chunk_text, chunk_hash, count_tokens
+from app.extraction import JSONObjectScanner, extract_json_object, record_parse, PARSE_EXTRACTED, PARSE_FAILED, PARSE_OK
+from app.llm import PRIMARY, acomplete
+from app.models import Visit
+from app.prompts import (
+    registry, RenderedPrompt, POST_VISIT_PROMPT, POST_VISIT_NOTE_PROMPT, POST_VISIT_CHUNK_PROMPT,
+)
+from app.schemas import PostVisitResponse
+from app.whereby import lookup_transcription
+from app.settings import env
+
+logger = logging.getLogger(__name__)
+
+# Transcripts over this many tokens are split on utterance boundaries and condensed chunk by chunk
+POST_VISIT_CHUNK_TOKENS = int(env("POST_VISIT_CHUNK_TOKENS", "3000"))
+POST_VISIT_MAP_CONCURRENCY = int(env("POST_VISIT_MAP_CONCURRENCY", "8"))
+# Condense the condensed notes again if they are still over budget, at most this many times
+POST_VISIT_MAX_CONDENSE_ROUNDS = int(env("POST_VISIT_MAX_CONDENSE_ROUNDS", "3"))
+CHUNK_SUMMARY_CACHE_MAX_ENTRIES = int(env("CHUNK_SUMMARY_CACHE_MAX_ENTRIES", "4096"))
+CHUNK_SUMMARY_CACHE_TTL = float(env("CHUNK_SUMMARY_CACHE_TTL", "86400"))
+
+# Chunk notes keyed by (template id, model, transcriptionId, chunk hash); on disk in the LLM cache file, in a table of their own
+chunk_summary_cache = LLMCache(
+    max_entries=CHUNK_SUMMARY_CACHE_MAX_ENTRIES,
+    ttl=CHUNK_SUMMARY_CACHE_TTL,
+    disk=DiskCache(
+        LLM_CACHE_PATH, CHUNK_SUMMARY_CACHE_MAX_ENTRIES, CHUNK_SUMMARY_CACHE_TTL, table="chunk_summary_cache"
+    ) if LLM_CACHE_PATH else None,
+)
+
+
+class CondensedTranscript(NamedTuple):
+    text: str
+    # Number of chunks summarized; 0 when the transcript fit and is used verbatim
+    chunks: int
+    # True if any chunk note is the stub served because the LLM was unavailable
+    fallback: bool
+
+
+async def fetch_transcription(
+    video_room_id: str, transcription_id: Optional[str] = None
+) -> Tuple[Optional[str], Optional[str]]:
+    """Fetch the visit's meeting transcription without blocking the event loop.
+
+    Returns (text, transcription_id); pass the id the visit already resolved, if any.
+    """
+    # lookup_transcription is blocking; keep it off the event loop
+    transcription_text, _, transcription_id = await run_in_threadpool(
+        lookup_transcription, video_room_id, transcription_id
+    )
+    if not transcription_text:
+        # To enable transcriptions, turn on "Live transcription" in the Whereby room template settings
+        logger.info(
+            "No transcription available, using provider note",
+            extra={"room_id": video_room_id},
+        )
+        return None, None
+    return transcription_text, transcription_id
+
+
+async def _summarize_chunk(
+    chunk: str, transcription_id: Optional[str], semaphore: asyncio.Semaphore
+) -> Tuple[str, bool, bool]:
+    """Notes for one chunk as (text, from_cache, fallback)."""
+    template = registry.get(POST_VISIT_CHUNK_PROMPT)
+    # A new prompt version or model must not reuse notes written by the old one
+    model = template.options.model or PRIMARY.model or ""
+    key = f"chunk:{template.id}:{model}:{transcription_id or ''}:{chunk_hash(chunk)}"
+    cached = chunk_summary_cache.get(key)
+    if cached is not None:
+        return cached, True, False
+    async with semaphore:
+        result = await acomplete(*template.render(chunk=chunk))
+    # Only real completions are reused on a re-run
+    if result.source not in ("stub", "fallback"):
+        chunk_summary_cache.set(key, result.text)
+    return result.text, False, result.fallback
+
+
+async def condense_transcript(
+    transcription_text: str, transcription_id: Optional[str] = None
+) -> CondensedTranscript:
+    """Map step: summarize token-budgeted chunks concurrently and join the notes in order."""
+    text = transcription_text
+    chunks_total = 0
+    fallback = False
+    semaphore = asyncio.Semaphore(POST_VISIT_MAP_CONCURRENCY)
+    for _ in range(POST_VISIT_MAX_CONDENSE_ROUNDS):
+        if count_tokens(text) <= POST_VISIT_CHUNK_TOKENS:
+            break
+        chunks = chunk_text(text, POST_VISIT_CHUNK_TOKENS)
+        notes = await asyncio.gather(*[_summarize_chunk(chunk, transcription_id, semaphore) for chunk in chunks])
+        logger.info(
+            "Condensed transcript chunks",
+            extra={
+                "transcription_id": transcription_id,
+                "chunks": len(chunks),
+                "cached": sum(1 for _, from_cache, _ in notes if from_cache),
+            },
+        )
+        text = "\n\n".join(note for note, _, _ in notes)
+        chunks_total += len(chunks)
+        fallback = fallback or any(chunk_fallback for _, _, chunk_fallback in notes)
+    return CondensedTranscript(text, chunks_total, fallback)
+
+
+def needs_condensing(transcription_text: Optional[str]) -> bool:
+    return bool(transcription_text) and count_tokens(transcription_text) > POST_VISIT_CHUNK_TOKENS
+
+
+async def prepare_post_visit_prompts(
+    transcription_text: Optional[str],
+    provider_note: str,
+    intake_structured: Dict[str, Any],
+    transcription_id: Optional[str] = None,
+) -> Tuple[RenderedPrompt, bool]:
+    """Condense a long transcript if needed, then render the reduce prompt.
+
+    Returns (prompt, fallback); `fallback` is True when a chunk note had to
+    come from the stub.
+    """
+    condensed = None
+    if transcription_text:
+        condensed = await condense_transcript(transcription_text, transcription_id)
+    prompt = build_post_visit_prompts(
+        condensed.text if condensed else None,
+        provider_note,
+        intake_structured,
+        condensed=bool(condensed and condensed.chunks),
+    )
+    return prompt, bool(condensed and condensed.fallback)
+
+
+def build_post_visit_prompts(
+    transcription_text: Optional[str],
+    provider_note: str,
+    intake_structured: Dict[str, Any],
+    condensed: bool = False,
+) -> RenderedPrompt:
+    """Render the post-visit template: from the transcription if there is one, else from the provider note.
+
+    `condensed` means `transcription_text` holds chunk notes rather than the raw transcript.
+    """
+    if transcription_text:
+        heading = "Meeting notes, condensed in order from the transcription" if condensed else "Meeting transcription"
+        return registry.get(POST_VISIT_PROMPT).render(heading=heading, transcription=transcription_text)
+    return registry.get(POST_VISIT_NOTE_PROMPT).render(
+        provider_note=provider_note, intake_json=json.dumps(intake_structured)
+    )
+
+
+FALLBACK_POST_VISIT = PostVisitResponse(
+    patient_summary={
+        "what_we_discussed": "We discussed your birth control options.",
+        "next_steps": ["Follow up as recommended"],
+        "watch_fors": ["Contact us if you have concerns"]
+    },
+    plain_text="We discussed your birth control options. Follow up as recommended. Contact us if you have concerns."
+)
+
+
+def parse_post_visit_response(response_text: str) -> PostVisitResponse:
+    """Parse the LLM completion, falling back to a generic summary."""
+    return post_visit_result(extract_json_object(response_text))
+
+
+def post_visit_result(scanner: JSONObjectScanner) -> PostVisitResponse:
+    """Validate the object a finished scanner found (e.g. one fed from a stream)."""
+    parsed = scanner.result
+    if parsed is not None:
+        try:
+            result = PostVisitResponse.model_validate({
+                "patient_summary": parsed.get("patient_summary") or {},
+                "plain_text": parsed.get("plain_text") or "",
+            })
+            record_parse("post_visit", PARSE_EXTRACTED if scanner.wrapped else PARSE_OK)
+            return result
+        except ValidationError:
+            pass
+    record_parse("post_visit", PARSE_FAILED)
+    return FALLBACK_POST_VISIT.model_copy(deep=True)
+
+
+def apply_post_visit_result(
+    db: Session, visit: Visit, result: PostVisitResponse, template: Optional[str] = None
+) -> None:
+    """Copy a post-visit result onto the visit row; the caller commits.
+
+    `template` is the id of the prompt that produced it. The transcript itself
+    stays in the transcript store, not on the visit. The audit events from
+    post_visit_events() are the caller's to queue once this is committed.
+    """
+    visit.patient_summary = result.plain_text
+    visit.status = "summary_ready"
+    visit.summary_template = template
+
+
+def post_visit_events(fallback: bool) -> List[str]:
+    """Audit events for a stored summary; a stub answer served because the provider failed is always recorded."""
+    return ["llm_fallback", "summary_ready"] if fallback else ["summary_ready"]
@@ -0,0 +1,187 @@
+"""Named, versioned prompt templates, compiled once at import.
+
+Each template version pins its model, temperature and max_tokens. System
+prompts are static and user templates put their fixed instructions ahead of
+the request data, so every call for a template starts with the same prefix
+and provider-side prompt caching can hit. PROMPT_<NAME>_VERSION selects the
+version in use (default: the highest); visits record the id (`name@version`)
+that produced their intake and summary, so versions can be compared.
+"""
+import string
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from app.settings import env
+
+
+class GenerationOptions(NamedTuple):
+    # None uses the endpoint's model (LLM_MODEL, or the provider default)
+    model: Optional[str] = None
+    temperature: float = 0.7
+    # None leaves it to the provider (1000 on legacy completions)
+    max_tokens: Optional[int] = None
+    # Template id, e.g. "intake@1"; picks the canned stub response when no API key is set
+    template: Optional[str] = None
+
+
+class RenderedPrompt(NamedTuple):
+    system_prompt: str
+    user_prompt: str
+    options: GenerationOptions
+
+    @property
+    def template(self) -> Optional[str]:
+        return self.options.template
+
+
+def _compile(source: str) -> Tuple[List[Tuple[str, Optional[str]]], FrozenSet[str]]:
+    """Split a str.format template into (literal, field) segments, once."""
+    segments = []
+    for literal, field, spec, conversion in string.Formatter().parse(source):
+        if field is not None and (not field.isidentifier() or spec or conversion):
+            raise ValueError(f"Only plain {{name}} fields are supported, got {{{field}}}")
+        segments.append((literal, field))
+    return segments, frozenset(field for _, field in segments if field is not None)
+
+
+class PromptTemplate:
+    """One version of a named prompt; render() fills the user template's fields."""
+
+    def __init__(self, name: str, version: int, system: str, user: str, model: Optional[str] = None,
+                 temperature: float = 0.7, max_tokens: Optional[int] = None):
+        if _compile(system)[1]:
+            raise ValueError(f"{name}@{version}: the system prompt must be static")
+        self.name = name
+        self.version = version
+        # Literal braces in the system prompt were written as {{ }}
+        self.system = system.replace("{{", "{").replace("}}", "}")
+        self._segments, self.fields = _compile(user)
+        if self._segments and not self._segments[0][0]:
+            raise ValueError(f"{self.id}: the user prompt must start with fixed text, not a field")
+        self.options = GenerationOptions(model, temperature, max_tokens, self.id)
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@{self.version}"
+
+    def render(self, **values: Any) -> RenderedPrompt:
+        if values.keys() != self.fields:
+            raise TypeError(f"{self.id} takes fields {sorted(self.fields)}, got {sorted(values)}")
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return RenderedPrompt(self.system, "".join(parts), self.options)
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._versions: Dict[str, Dict[int, PromptTemplate]] = {}
+        self._active: Dict[str, PromptTemplate] = {}
+        self._by_system: Dict[str, PromptTemplate] = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        versions = self._versions.setdefault(template.name, {})
+        if template.version in versions:
+            raise ValueError(f"{template.id} is already registered")
+        versions[template.version] = template
+        self._active.pop(template.name, None)
+        self._by_system.setdefault(template.system, template)
+        return template
+
+    def get(self, name: str, version: Optional[int] = None) -> PromptTemplate:
+        """A specific version, or the one selected by PROMPT_<NAME>_VERSION (default: highest)."""
+        versions = self._versions[name]
+        if version is not None:
+            return versions[version]
+        active = self._active.get(name)
+        if active is None:
+            configured = env(f"PROMPT_{name.upper()}_VERSION")
+            selected = int(configured) if configured else max(versions)
+            if selected not in versions:
+                raise ValueError(f"PROMPT_{name.upper()}_VERSION={selected}: no such version of {name}")
+            active = self._active[name] = versions[selected]
+        return active
+
+    def for_system_prompt(self, system_prompt: str) -> Optional[PromptTemplate]:
+        """The template a system prompt came from, for callers that only see the messages."""
+        return self._by_system.get(system_prompt)
+
+    def active(self) -> Dict[str, Dict[str, Any]]:
+        """Generation settings (including the template id) in use per name, for GET /llm/status."""
+        return {
+            name: template.options._asdict()
+            for name, template in ((name, self.get(name)) for name in sorted(self._versions))
+        }
+
+
+registry = PromptRegistry()
+
+INTAKE_PROMPT = "intake"
+INTAKE_REPAIR_PROMPT = "intake_repair"
+POST_VISIT_PROMPT = "post_visit"
+POST_VISIT_NOTE_PROMPT = "post_visit_note"
+POST_VISIT_CHUNK_PROMPT = "post_visit_chunk"
+
+registry.register(PromptTemplate(
+    INTAKE_PROMPT, 1,
+    system="""You convert short intake Q and A into JSON for a clinician and a patient.
+Follow the target schema. Unknown fields are null. Do not invent data.""",
+    user="""Convert the following Q and A into:
+1) intake_structured JSON with fields reason, age, last_period, pregnancy_risk, contra_indications, preferences, history, insurance
+2) provider_note with four lines: chief concern, key history, red flags, plan suggestion
+3) patient_summary at grade eight reading level with two short paragraphs
+
+Q and A:
+{qa_text}""",
+))
+
+registry.register(PromptTemplate(
+    INTAKE_REPAIR_PROMPT, 1,
+    system="""You correct fields of a clinical intake record that failed validation.
+Reply with one JSON object holding only the listed fields. Use null when the value is unknown. Do not invent data.""",
+    user="""Fields to correct:
+{fields}""",
+))
+
+# With a transcription; `heading` says whether it holds the raw transcript or condensed chunk notes
+registry.register(PromptTemplate(
+    POST_VISIT_PROMPT, 1,
+    system="""You write simple patient explanations. Reading level grade eight. Use short sentences.""",
+    user="""Create a three part summary based on the actual meeting transcription:
+one, what we talked about during the visit.
+two, what to do next with any dates mentioned.
+three, what to watch for and when to get help.
+
+{heading}:
+{transcription}""",
+))
+
+# No transcription: summarize from the provider note and structured intake
+registry.register(PromptTemplate(
+    POST_VISIT_NOTE_PROMPT, 1,
+    system="""You write simple patient explanations. Reading level grade eight. Use short sentences.""",
+    user="""Create a three part summary:
+one, what we talked about.
+two, what to do next with any dates.
+three, what to watch for and when to get help.
+
+Provider note:
+{provider_note}
+
+Intake structured JSON:
+{intake_json}""",
+))
+
+registry.register(PromptTemplate(
+    POST_VISIT_CHUNK_PROMPT, 1,
+    system="""You take notes on one part of a clinical visit transcript. Be factual and brief.""",
+    user="""List as short bullet points, in order:
+what was discussed,
+next steps or instructions with any dates mentioned,
+warning signs or reasons to get help that were mentioned.
+Say who said what when it matters.
+
+Transcript part:
+{chunk}""",
+))
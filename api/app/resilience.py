@@ -0,0 +1,128 @@
+"""Circuit breaker, latency window and token bucket used by the LLM dispatcher."""
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Dict
+
+
+class CircuitBreaker:
+    """Fail fast after repeated failures, then let a single probe through.
+
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open once `reset_timeout` seconds have passed;
+    half_open -> closed on a successful probe, or back to open on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go out now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give up a half-open probe without a verdict (e.g. a cancelled hedge)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures}
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for picking a hedge delay."""
+
+    def __init__(self, size: int = 256):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> float:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units a minute, holding at most one minute's worth.
+
+    Callers check wait_time() and take() under their own lock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds of refill until `amount` is available.
+
+        For amounts over the capacity (several queued calls) this estimates
+        how long the queue takes to drain.
+        """
+        self._refill(now)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+    def pause(self, seconds: float, now: float) -> None:
+        """Empty the bucket for `seconds`, e.g. when the provider answered 429 with Retry-After."""
+        self._refill(now)
+        self.level = min(self.level, -seconds * self.rate)
+
+
+def backoff_delay(attempt: int, base: float, ceiling: float) -> float:
+    """Exponential backoff with full jitter for retry `attempt` (1-based)."""
+    return random.uniform(0, min(ceiling, base * (2 ** (attempt - 1))))
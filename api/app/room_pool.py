@@ -0,0 +1,157 @@
+"""Pool of pre-created Whereby rooms so /create_room never waits on the meetings API."""
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+
+from app.resilience import backoff_delay
+from app.whereby import api_room_creation_enabled, create_meeting, create_room
+from app.settings import env
+
+logger = logging.getLogger(__name__)
+
+# Unused rooms kept ready; 0 disables the pool
+ROOM_POOL_SIZE = int(env("ROOM_POOL_SIZE", "5"))
+ROOM_POOL_REFILL_CONCURRENCY = int(env("ROOM_POOL_REFILL_CONCURRENCY", "2"))
+# Rooms with less validity left than this are discarded instead of handed out
+ROOM_POOL_MIN_REMAINING_SECONDS = float(env("ROOM_POOL_MIN_REMAINING_SECONDS", "7200"))
+# How often the refill task re-checks expiry when nothing is taken
+ROOM_POOL_CHECK_INTERVAL = float(env("ROOM_POOL_CHECK_INTERVAL", "60"))
+
+
+class RoomPool:
+    """FIFO of ready rooms with a background refill task.
+
+    take() is O(1) and safe from threadpool endpoints; it signals the refill
+    task, which runs on the event loop and creates rooms in the threadpool.
+    """
+
+    def __init__(self, size: int = ROOM_POOL_SIZE, concurrency: int = ROOM_POOL_REFILL_CONCURRENCY,
+                 min_remaining: float = ROOM_POOL_MIN_REMAINING_SECONDS):
+        self.size = size
+        self.concurrency = concurrency
+        self.min_remaining = timedelta(seconds=min_remaining)
+        self._rooms: Deque[Dict[str, Any]] = deque()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.handed_out = 0
+        self.misses = 0
+        self.created = 0
+        self.expired = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and api_room_creation_enabled()
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _usable(self, room: Dict[str, Any]) -> bool:
+        return room["expires_at"] - datetime.now(timezone.utc) >= self.min_remaining
+
+    def take(self) -> Optional[Dict[str, str]]:
+        """Pop the oldest usable room, or None if the pool is empty."""
+        room = None
+        with self._lock:
+            while self._rooms:
+                candidate = self._rooms.popleft()
+                if self._usable(candidate):
+                    room = candidate
+                    self.handed_out += 1
+                    break
+                self.expired += 1
+            if room is None:
+                self.misses += 1
+        self._notify()
+        if room is None:
+            return None
+        return {"room_id": room["room_id"], "join_url": room["join_url"]}
+
+    def _notify(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _prune(self) -> None:
+        with self._lock:
+            usable = [room for room in self._rooms if self._usable(room)]
+            self.expired += len(self._rooms) - len(usable)
+            self._rooms = deque(usable)
+
+    async def _create_one(self) -> bool:
+        try:
+            room = await run_in_threadpool(create_meeting)
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            logger.warning("Room pool refill failed", extra={"error": str(e)})
+            return False
+        with self._lock:
+            self._rooms.append(room)
+            self.created += 1
+        return True
+
+    async def _refill_loop(self) -> None:
+        failures = 0
+        while True:
+            self._prune()
+            deficit = self.size - len(self._rooms)
+            if deficit > 0:
+                batch = min(deficit, self.concurrency)
+                results = await asyncio.gather(*[self._create_one() for _ in range(batch)])
+                if all(results):
+                    failures = 0
+                    continue
+                # Back off while the meetings API is failing, but keep any rooms that were made
+                failures += 1
+                await asyncio.sleep(backoff_delay(failures, 1.0, ROOM_POOL_CHECK_INTERVAL))
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=ROOM_POOL_CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            expiries: List[datetime] = [room["expires_at"] for room in self._rooms]
+            return {
+                "enabled": self.enabled,
+                "target_size": self.size,
+                "ready": len(self._rooms),
+                "handed_out": self.handed_out,
+                "misses": self.misses,
+                "created": self.created,
+                "expired": self.expired,
+                "failures": self.failures,
+                "next_expiry": min(expiries).isoformat() if expiries else None,
+            }
+
+
+room_pool = RoomPool()
+
+
+def acquire_room() -> Dict[str, str]:
+    """A pooled room when available, otherwise create_room() synchronously."""
+    if room_pool.enabled:
+        room = room_pool.take()
+        if room is not None:
+            logger.info("Handed out pooled Whereby room", extra={"room_id": room["room_id"]})
+            return room
+        logger.info("Room pool empty, creating room synchronously")
+    return create_room()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -31,6 +31,28 @@ class IntakeResponse(BaseModel):
     events_added: List[str]
 
 
+class IntakeBatchRequest(BaseModel):
+    items: List[IntakeRequest] = Field(..., min_length=1, max_length=5000)
+
+
+class IntakeBatchItemResult(BaseModel):
+    visit_id: str
+    status: str
+    intake_structured: Optional[Dict[str, Any]] = None
+    provider_note: Optional[str] = None
+    patient_summary: Optional[str] = None
+    # Prompt template id (name@version) used for the conversion
+    template: Optional[str] = None
+
+
+class IntakeBatchResponse(BaseModel):
+    results: List[IntakeBatchItemResult]
+    succeeded: int
+    fallback: int
+    unavailable: int = 0
+    not_found: int
+
+
 class RoomRequest(BaseModel):
     visit_id: str
 
@@ -73,4 +95,31 @@ class VisitResponse(BaseModel):
     patient_summary: Optional[str] = None
     video_room_id: Optional[str] = None
     pharmacy_request: Optional[Dict[str, Any]] = None
+    # Prompt template ids (name@version) that produced the intake and the summary
+    intake_template: Optional[str] = None
+    summary_template: Optional[str] = None
     audit_events: Optional[List[str]] = None
+
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str
+
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    visit_id: Optional[str] = None
+    status: str
+    stage: Optional[str] = None
+    attempts: int
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    updated_at: datetime
+    next_run_at: Optional[datetime] = None
+
+
+class VisitListResponse(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,50 @@
+"""JSON bytes for hot responses, spliced from pre-serialized column text where possible."""
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, NamedTuple, Optional, Tuple
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder gives the same JSON, more slowly
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class RawJSON(NamedTuple):
+    """JSON text that is already serialized (e.g. a JSON column read as text); None is null."""
+    text: Optional[str]
+
+
+def dumps_object(items: Iterable[Tuple[str, Any]]) -> bytes:
+    """Encode (key, value) pairs as one JSON object, copying RawJSON values through unparsed."""
+    parts = []
+    for key, value in items:
+        if isinstance(value, RawJSON):
+            encoded = value.text.encode("utf-8") if value.text is not None else b"null"
+        else:
+            encoded = dumps(value)
+        parts.append(dumps(key) + b":" + encoded)
+    return b"{" + b",".join(parts) + b"}"
+
+
+class JSONBytesResponse(Response):
+    """JSON response that passes bytes through and encodes anything else with orjson when installed."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
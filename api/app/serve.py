@@ -0,0 +1,71 @@
+"""Serving under uvicorn, optionally with several worker processes.
+
+    python -m app.serve                    # WEB_CONCURRENCY workers, default one per CPU
+    python -m app.serve --workers 4 --port 8000
+
+Every status write is durable before its request answers, and the room pool
+and LLM rate limits are split across workers, so any worker can serve any
+request. gunicorn.conf.py applies the same sizing and environment for
+`gunicorn -c gunicorn.conf.py app.main:app`.
+"""
+import argparse
+import math
+import os
+from pathlib import Path
+
+from app.settings import env
+
+SERVE_HOST = env("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(env("SERVE_PORT", "8000"))
+# Where workers share cached LLM completions when LLM_CACHE_PATH isn't set
+SHARED_CACHE_PATH = env("SHARED_CACHE_PATH", "./data/llm_cache.sqlite")
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    """WEB_CONCURRENCY if set, otherwise one worker per available CPU."""
+    return max(1, int(env("WEB_CONCURRENCY", str(available_cpus()))))
+
+
+def prepare_worker_env(workers: int) -> None:
+    """Environment inherited by every worker; call in the parent before workers start.
+
+    Workers share one SQLite cache file so a completion cached by one is a hit
+    in the others. ROOM_POOL_SIZE and the LLM rate limits stay totals for the
+    deployment rather than being multiplied by the worker count.
+    """
+    if workers <= 1:
+        return
+    if not env("LLM_CACHE_PATH"):
+        Path(SHARED_CACHE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        os.environ["LLM_CACHE_PATH"] = SHARED_CACHE_PATH
+    pool_size = int(env("ROOM_POOL_SIZE", "5"))
+    if pool_size > 0:
+        os.environ["ROOM_POOL_SIZE"] = str(math.ceil(pool_size / workers))
+    # Each worker runs its own admission buckets, so give each its share of the provider limits
+    for name in ("LLM_RATE_LIMIT_RPM", "LLM_RATE_LIMIT_TPM"):
+        limit = float(env(name, "0"))
+        if limit > 0:
+            os.environ[name] = str(limit / workers)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    args = parser.parse_args()
+
+    workers = args.workers or worker_count()
+    prepare_worker_env(workers)
+    # Each worker imports the app itself (no preload), so engines and threads are never shared across a fork
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers)
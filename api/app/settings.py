@@ -0,0 +1,59 @@
+"""Process-wide settings; .env files are read once, when this module is first imported."""
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+from dotenv import load_dotenv
+
+API_DIR = Path(__file__).parent.parent  # api/
+ROOT_DIR = API_DIR.parent  # ReproCare/
+
+# api/.env never overrides the real environment; the others override in order
+ENV_FILES = (
+    (API_DIR / ".env", False),
+    (API_DIR / "app" / ".env", True),
+    (ROOT_DIR / ".env.api", True),
+    (ROOT_DIR / ".env", True),
+)
+
+
+def _load_env_files() -> None:
+    for path, override in ENV_FILES:
+        if path.is_file():
+            load_dotenv(path, override=override)
+
+
+_load_env_files()
+
+
+def env(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Read a variable after the .env files have been applied."""
+    return os.getenv(name, default)
+
+
+def env_flag(name: str, default: str = "false") -> bool:
+    return env(name, default).lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Settings shared by several modules; module-specific knobs stay next to their code."""
+
+    database_url: str
+    llm_base_url: str
+    llm_api_key: Optional[str]
+    whereby_api_key: Optional[str]
+    whereby_room_template_id: Optional[str]
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            database_url=env("DATABASE_URL", "sqlite:///./mvp.sqlite"),
+            llm_base_url=env("LLM_BASE_URL", "https://api.openai.com/v1/chat/completions"),
+            llm_api_key=env("LLM_API_KEY"),
+            whereby_api_key=env("WHEREBY_API_KEY"),
+            whereby_room_template_id=env("WHEREBY_ROOM_TEMPLATE_ID"),
+        )
+
+
+settings = Settings.from_env()
@@ -0,0 +1,105 @@
+"""Compressed transcript store keyed by Whereby transcriptionId."""
+import zlib
+import logging
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session, load_only, undefer
+
+from app.db import SessionLocal
+from app.models import Transcript
+from app.settings import env
+
+logger = logging.getLogger(__name__)
+
+# "zlib" (stdlib) or "zstd" (needs the optional zstandard package)
+TRANSCRIPT_CODEC = env("TRANSCRIPT_CODEC", "zlib").lower()
+TRANSCRIPT_COMPRESSION_LEVEL = int(env("TRANSCRIPT_COMPRESSION_LEVEL", "6"))
+
+
+class StoredTranscript(NamedTuple):
+    transcription_id: str
+    text: str
+    etag: Optional[str]
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def compress(text: str) -> Tuple[str, bytes]:
+    """Return (codec, blob); falls back to zlib when zstd isn't installed."""
+    raw = text.encode("utf-8")
+    zstandard = _zstd() if TRANSCRIPT_CODEC == "zstd" else None
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=TRANSCRIPT_COMPRESSION_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, TRANSCRIPT_COMPRESSION_LEVEL)
+
+
+def decompress(codec: str, blob: bytes) -> str:
+    if codec == "zstd":
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd transcripts")
+        return zstandard.ZstdDecompressor().decompress(blob).decode("utf-8")
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def _to_stored(row: Transcript) -> StoredTranscript:
+    return StoredTranscript(row.transcription_id, decompress(row.codec, row.content), row.etag)
+
+
+def load(transcription_id: str) -> Optional[StoredTranscript]:
+    """A stored transcript by id, or None."""
+    db = SessionLocal()
+    try:
+        row = (
+            db.query(Transcript)
+            .options(undefer(Transcript.content))
+            .filter(Transcript.transcription_id == transcription_id, Transcript.content.isnot(None))
+            .first()
+        )
+        return _to_stored(row) if row else None
+    finally:
+        db.close()
+
+
+def put(db: Session, transcription_id: str, room_name: Optional[str], text: str,
+        etag: Optional[str] = None, state: str = "ready") -> None:
+    """Insert or replace a transcript in the session; the caller commits."""
+    codec, blob = compress(text)
+    row = (
+        db.query(Transcript)
+        .options(load_only(Transcript.transcription_id))
+        .filter(Transcript.transcription_id == transcription_id)
+        .first()
+    )
+    if row is None:
+        row = Transcript(transcription_id=transcription_id)
+        db.add(row)
+    row.room_name = room_name
+    row.state = state
+    row.etag = etag
+    row.codec = codec
+    row.content = blob
+    row.size = len(text.encode("utf-8"))
+    row.compressed_size = len(blob)
+    row.fetched_at = datetime.utcnow()
+
+
+def save(transcription_id: str, room_name: Optional[str], text: str,
+         etag: Optional[str] = None, state: str = "ready") -> None:
+    """Store a downloaded transcript in its own short transaction."""
+    db = SessionLocal()
+    try:
+        put(db, transcription_id, room_name, text, etag, state)
+        db.commit()
+    except Exception:
+        db.rollback()
+        # The store is an optimization; a failed write only costs a later re-download
+        logger.exception("Failed to store transcript", extra={"transcription_id": transcription_id})
+    finally:
+        db.close()
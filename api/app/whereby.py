@@ -1,22 +1,72 @@
 import os
-import requests
-from typing import Dict, Optional
-from dotenv import load_dotenv
-from pathlib import Path
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 
-# Try loading from multiple locations
-base_dir = Path(__file__).parent.parent  # api/
-root_dir = base_dir.parent  # ReproCare/
+from app import transcripts
+from app.metrics import span
+from app.settings import env, settings
 
-# Load in order: api/.env, api/app/.env, root/.env.api, root/.env
-# Use override=True so later files override earlier ones
-load_dotenv(base_dir / ".env", override=False)  # api/.env
-load_dotenv(base_dir / "app" / ".env", override=True)  # api/app/.env (override if exists)
-load_dotenv(root_dir / ".env.api", override=True)  # root/.env.api (override if exists)
-load_dotenv(root_dir / ".env", override=True)  # root/.env (fallback)
+if TYPE_CHECKING:
+    import requests
 
-WHEREBY_API_KEY = os.getenv("WHEREBY_API_KEY")
-WHEREBY_ROOM_TEMPLATE_ID = os.getenv("WHEREBY_ROOM_TEMPLATE_ID")
+logger = logging.getLogger(__name__)
+
+# .env files (api/.env, api/app/.env, root .env.api, root .env) are applied by app.settings
+WHEREBY_API_KEY = settings.whereby_api_key
+WHEREBY_ROOM_TEMPLATE_ID = settings.whereby_room_template_id
+
+WHEREBY_MEETINGS_URL = env("WHEREBY_MEETINGS_URL", "https://api.whereby.com/v1/meetings")
+# How long API-created rooms stay valid (Whereby requires an endDate)
+WHEREBY_ROOM_TTL_SECONDS = float(env("WHEREBY_ROOM_TTL_SECONDS", "86400"))
+
+STUB_ROOM = {"room_id": "demo-room", "join_url": "https://whereby.com/your-demo"}
+
+
+def api_room_creation_enabled() -> bool:
+    """True when rooms are created through the meetings API (no template room, key present)."""
+    template_id = os.getenv("WHEREBY_ROOM_TEMPLATE_ID") or WHEREBY_ROOM_TEMPLATE_ID
+    api_key = os.getenv("WHEREBY_API_KEY") or WHEREBY_API_KEY
+    return not template_id and bool(api_key)
+
+
+def create_meeting() -> Dict[str, Any]:
+    """Create one room through the meetings API; raises on failure.
+
+    Returns room_id, join_url and expires_at (a timezone-aware datetime).
+    """
+    api_key = os.getenv("WHEREBY_API_KEY") or WHEREBY_API_KEY
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=WHEREBY_ROOM_TTL_SECONDS)
+    payload = {
+        "isLocked": False,
+        "roomMode": "normal",
+        "endDate": expires_at.isoformat(),
+    }
+    
+    with span("whereby", "create_room"):
+        response = _get_session().post(
+            WHEREBY_MEETINGS_URL,
+            headers=headers,
+            json=payload,
+            timeout=WHEREBY_HTTP_TIMEOUT
+        )
+    response.raise_for_status()
+    data = response.json()
+    if data.get("endDate"):
+        expires_at = datetime.fromisoformat(data["endDate"].replace("Z", "+00:00"))
+    return {
+        "room_id": data.get("meetingId", "demo-room"),
+        "join_url": data.get("roomUrl", "https://whereby.com/your-demo"),
+        "expires_at": expires_at,
+    }
 
 
 def create_room() -> Dict[str, str]:
@@ -32,7 +82,7 @@ def create_room() -> Dict[str, str]:
         room_id = template_id
         # Use the embed URL format from Whereby
         join_url = f"https://repro-care.whereby.com/{room_id}"
-        print(f"Using existing Whereby room: {room_id[:20]}...")
+        logger.debug("Using existing Whereby room", extra={"room_id": room_id[:20]})
         return {
             "room_id": room_id,
             "join_url": join_url
@@ -40,52 +90,232 @@ def create_room() -> Dict[str, str]:
     
     # If no template ID, try API creation (only if API key is available)
     if not api_key:
-        print("WARNING: No WHEREBY_ROOM_TEMPLATE_ID or WHEREBY_API_KEY, using stub room")
-        return {
-            "room_id": "demo-room",
-            "join_url": "https://whereby.com/your-demo"
-        }
+        logger.warning("No WHEREBY_ROOM_TEMPLATE_ID or WHEREBY_API_KEY, using stub room")
+        return dict(STUB_ROOM)
     
     # Try API creation as fallback
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
+    try:
+        room = create_meeting()
+        logger.info("Created Whereby room via API", extra={"room_id": room["room_id"]})
+        return {"room_id": room["room_id"], "join_url": room["join_url"]}
+    except Exception as e:
+        logger.warning("Whereby room creation failed, using stub room", extra={"error": str(e)})
+        return dict(STUB_ROOM)
+
+
+WHEREBY_API_BASE = env("WHEREBY_API_BASE", "https://api.whereby.dev/v1")
+WHEREBY_HTTP_TIMEOUT = float(env("WHEREBY_HTTP_TIMEOUT", "10"))
+# How many recent transcriptions the single listing call fetches for local matching
+WHEREBY_TRANSCRIPTION_LIST_LIMIT = int(env("WHEREBY_TRANSCRIPTION_LIST_LIMIT", "50"))
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+_variant_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="whereby-variant")
+
+
+def _get_session() -> "requests.Session":
+    """Return a shared keep-alive session for Whereby API calls."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # Imported on first use; requests is a noticeable share of startup time
+            import requests
+            from requests.adapters import HTTPAdapter
+            
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _room_name_variants(room_name: str) -> List[str]:
+    """Room name formats Whereby may report for our room, in priority order."""
+    if room_name.startswith("/"):
+        return [room_name, room_name[1:]]
+    return [room_name, f"/{room_name}", f"/repro-care/{room_name}"]
+
+
+def _matches_room(candidate: str, room_name: str, variants: List[str]) -> bool:
+    if not candidate:
+        return False
+    if candidate in variants:
+        return True
+    room_id_short = room_name.split('-')[-1] if '-' in room_name else room_name
+    return room_id_short in candidate or room_name in candidate
+
+
+def _list_transcriptions(headers: Dict[str, str], params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """GET /transcriptions; None on HTTP error."""
+    operation = "list_transcriptions_by_room" if "roomName" in params else "list_transcriptions"
+    with span("whereby", operation):
+        response = _get_session().get(
+            f"{WHEREBY_API_BASE}/transcriptions",
+            headers=headers,
+            params=params,
+            timeout=WHEREBY_HTTP_TIMEOUT
+        )
+    if response.status_code != 200:
+        logger.warning(
+            "Whereby transcription listing failed",
+            extra={"status_code": response.status_code, "params": params, "body": response.text[:200]},
+        )
+        return None
+    return response.json().get("results", [])
+
+
+def _find_room_transcriptions(room_name: str, headers: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Find transcriptions for a room, newest first.
+
+    One listing call is matched locally against all room name variants; only
+    if that finds nothing are the per-variant queries issued, concurrently.
+    """
+    variants = _room_name_variants(room_name)
     
-    payload = {
-        "isLocked": False,
-        "roomMode": "normal"
-    }
+    recent = _list_transcriptions(
+        headers, {"limit": WHEREBY_TRANSCRIPTION_LIST_LIMIT, "sortBy": "startDate:desc"}
+    ) or []
+    if recent and logger.isEnabledFor(logging.DEBUG):
+        # Verbose listing for debugging room name mismatches; sampled to keep volume down
+        logger.debug(
+            "Recent Whereby transcriptions",
+            extra={
+                "sampled": True,
+                "transcriptions": [
+                    {key: t.get(key) for key in ("roomName", "type", "state", "startDate")}
+                    for t in recent[:10]
+                ],
+            },
+        )
+    matching = [t for t in recent if _matches_room(t.get("roomName", ""), room_name, variants)]
+    if matching:
+        logger.debug("Matched room in recent listing", extra={"room_name": room_name, "matches": len(matching)})
+        return matching
     
-    try:
-        response = requests.post(
-            "https://api.whereby.com/v1/meetings",
+    # Each task gets its own context copy so request ids and spans follow it into the pool
+    futures = [
+        _variant_executor.submit(
+            contextvars.copy_context().run,
+            _list_transcriptions,
+            headers,
+            {"roomName": variant, "limit": 10, "sortBy": "startDate:desc"},
+        )
+        for variant in variants
+    ]
+    # Keep variant priority order when several respond
+    for variant, future in zip(variants, futures):
+        try:
+            results = future.result()
+        except Exception as e:
+            logger.warning("Whereby variant lookup failed", extra={"variant": variant, "error": str(e)})
+            continue
+        if results:
+            logger.debug("Matched room name variant", extra={"variant": variant, "matches": len(results)})
+            return results
+    
+    logger.info("No transcriptions found for room", extra={"room_name": room_name, "variants": variants})
+    return []
+
+
+def _download_transcription(
+    transcription_id: str,
+    headers: Dict[str, str],
+    stored: Optional[transcripts.StoredTranscript] = None,
+) -> Optional[Tuple[str, Optional[str], bool]]:
+    """Resolve the access link for a transcription and download its text.
+
+    Returns (text, etag, modified). With a stored copy the download is
+    conditional on its ETag, and a 304 returns the stored text.
+    """
+    session = _get_session()
+    with span("whereby", "access_link"):
+        access_response = session.get(
+            f"{WHEREBY_API_BASE}/transcriptions/{transcription_id}/access-link",
             headers=headers,
-            json=payload,
-            timeout=10
+            timeout=WHEREBY_HTTP_TIMEOUT
         )
-        response.raise_for_status()
-        data = response.json()
-        print(f"SUCCESS: Created Whereby room via API: {data.get('meetingId', 'unknown')}")
-        return {
-            "room_id": data.get("meetingId", "demo-room"),
-            "join_url": data.get("roomUrl", "https://whereby.com/your-demo")
-        }
-    except Exception as e:
-        print(f"WARNING: API creation failed ({e}), using stub room")
-        return {
-            "room_id": "demo-room",
-            "join_url": "https://whereby.com/your-demo"
-        }
+    
+    if access_response.status_code != 200:
+        logger.warning("Failed to get transcription access link", extra={"status_code": access_response.status_code})
+        return None
+    
+    access_link = access_response.json().get("accessLink")
+    if not access_link:
+        logger.warning("No access link in Whereby response")
+        return None
+    
+    conditional = {"If-None-Match": stored.etag} if stored and stored.etag else {}
+    with span("whereby", "download_transcription"):
+        transcript_response = session.get(access_link, headers=conditional, timeout=WHEREBY_HTTP_TIMEOUT)
+    if transcript_response.status_code == 304 and stored:
+        return stored.text, stored.etag, False
+    if transcript_response.status_code != 200:
+        logger.warning("Failed to download transcription", extra={"status_code": transcript_response.status_code})
+        return None
+    
+    return transcript_response.text, transcript_response.headers.get("ETag"), True
 
 
-def get_transcription(room_name: str) -> Optional[str]:
+def _fetch_transcription(transcription_id: str, room_name: str, headers: Dict[str, str]) -> Optional[str]:
+    """Download a ready transcription (conditionally, if stored) and keep it in the store."""
+    stored = transcripts.load(transcription_id)
+    downloaded = _download_transcription(transcription_id, headers, stored)
+    if downloaded is None:
+        return None
+    text, etag, modified = downloaded
+    if modified:
+        transcripts.save(transcription_id, room_name, text, etag)
+    return text
+
+
+# Transcription lookup outcomes
+TRANSCRIPTION_READY = "ready"
+TRANSCRIPTION_NOT_READY = "not_ready"
+TRANSCRIPTION_NOT_FOUND = "not_found"
+TRANSCRIPTION_UNAVAILABLE = "unavailable"
+
+
+def get_transcription(room_name: str, transcription_id: Optional[str] = None) -> Optional[str]:
     """Fetch transcription for a room session from Whereby API."""
+    return lookup_transcription(room_name, transcription_id)[0]
+
+
+def _load_stored(transcription_id: str) -> Optional[transcripts.StoredTranscript]:
+    try:
+        return transcripts.load(transcription_id)
+    except Exception:
+        logger.exception("Transcript store lookup failed")
+        return None
+
+
+def lookup_transcription(
+    room_name: str, transcription_id: Optional[str] = None
+) -> Tuple[Optional[str], str, Optional[str]]:
+    """Fetch a visit's transcription and report why when there is none.
+
+    Returns (text, state, transcription_id) where state is one of the
+    TRANSCRIPTION_* values; text is only set when state is TRANSCRIPTION_READY.
+    Pass the transcriptionId the visit resolved earlier: its stored copy is
+    used as is. Without one the room's transcriptions are always listed, as a
+    room can be shared by several visits, and only the download is skipped
+    when the newest ready one is already stored. Callers keep the id of a
+    ready transcription on the visit.
+    """
+    if transcription_id:
+        stored = _load_stored(transcription_id)
+        if stored:
+            logger.info(
+                "Using stored transcription",
+                extra={"transcription_id": transcription_id, "chars": len(stored.text)},
+            )
+            return stored.text, TRANSCRIPTION_READY, transcription_id
+    
     api_key = os.getenv("WHEREBY_API_KEY") or WHEREBY_API_KEY
     
     if not api_key:
-        print("WARNING: No WHEREBY_API_KEY for transcription fetch")
-        return None
+        logger.warning("No WHEREBY_API_KEY for transcription fetch")
+        return None, TRANSCRIPTION_UNAVAILABLE, transcription_id
     
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -93,147 +323,56 @@ def get_transcription(room_name: str) -> Optional[str]:
     }
     
     try:
-        # First, let's see ALL available transcriptions to debug
-        print(f"DEBUG: Fetching transcriptions for room: {room_name}")
-        all_transcriptions_response = requests.get(
-            "https://api.whereby.dev/v1/transcriptions",
-            headers=headers,
-            params={"limit": 20, "sortBy": "startDate:desc"},
-            timeout=10
-        )
-        
-        if all_transcriptions_response.status_code == 200:
-            all_data = all_transcriptions_response.json()
-            all_results = all_data.get("results", [])
-            print(f"DEBUG: Found {len(all_results)} total transcriptions available")
-            if all_results:
-                print("DEBUG: Available room names in transcriptions:")
-                for idx, t in enumerate(all_results[:10]):  # Show first 10
-                    room_name_in_transcription = t.get('roomName', 'N/A')
-                    transcription_type = t.get('type', 'N/A')
-                    state = t.get('state', 'N/A')
-                    start_date = t.get('startDate', 'N/A')
-                    print(f"  {idx+1}. roomName: '{room_name_in_transcription}' | type: {transcription_type} | state: {state} | start: {start_date}")
-                    
-                # Check if any transcription matches our room ID (even partially)
-                room_id_short = room_name.split('-')[-1] if '-' in room_name else room_name
-                matching = [t for t in all_results if room_id_short in t.get('roomName', '')]
-                if matching:
-                    print(f"DEBUG: Found {len(matching)} transcriptions that might match our room ID")
-                    for m in matching:
-                        print(f"  Potential match: {m.get('roomName')} (state: {m.get('state')})")
-        
-        # Get transcriptions for the room
-        # Try different room name formats - Whereby might use different formats
-        # Format 1: /room-prefix-{uuid}
-        # Format 2: just the room ID
-        # Format 3: /repro-care/{room_id}
-        # Format 4: /{org_id}/{room_id}
-        # Format 5: Look for room name that contains our room ID
-        room_name_variants = []
-        if room_name.startswith("/"):
-            room_name_variants.append(room_name)
-            room_name_variants.append(room_name[1:])
-        else:
-            room_name_variants.append(room_name)
-            room_name_variants.append(f"/{room_name}")
-            # Try with subdomain prefix
-            room_name_variants.append(f"/repro-care/{room_name}")
-        
-        # If we found transcriptions, try to match by room ID substring
-        if all_results:
-            room_id_short = room_name.split('-')[-1] if '-' in room_name else room_name
-            for t in all_results:
-                potential_room_name = t.get('roomName', '')
-                if room_id_short in potential_room_name or room_name in potential_room_name:
-                    if potential_room_name not in room_name_variants:
-                        room_name_variants.insert(0, potential_room_name)  # Try exact match first
-                        print(f"DEBUG: Added potential match to variants: {potential_room_name}")
+        # A retried "End visit" skips discovery: the visit already knows its transcription
+        if transcription_id:
+            # Resolved before but not stored (the store write failed); download it again by id
+            transcription_text = _fetch_transcription(transcription_id, room_name, headers)
+            if transcription_text is None:
+                return None, TRANSCRIPTION_UNAVAILABLE, transcription_id
+            return transcription_text, TRANSCRIPTION_READY, transcription_id
         
-        # Try each variant until we find transcriptions
-        response = None
-        data = None
-        results = []
+        results = _find_room_transcriptions(room_name, headers)
+        if not results:
+            return None, TRANSCRIPTION_NOT_FOUND, None
         
-        for variant in room_name_variants:
-            print(f"DEBUG: Trying room name variant: {variant}")
-            # Get more transcriptions so we can filter for ready ones
-            response = requests.get(
-                "https://api.whereby.dev/v1/transcriptions",
-                headers=headers,
-                params={"roomName": variant, "limit": 10, "sortBy": "startDate:desc"},
-                timeout=10
+        ready_results = [r for r in results if r.get("state") == "ready"]
+        if not ready_results:
+            latest = results[0]
+            # Transcriptions take a few minutes to process after the meeting ends
+            logger.info(
+                "Transcription not ready",
+                extra={
+                    "state": latest.get("state"),
+                    "transcription_id": latest.get("transcriptionId"),
+                    "start_date": latest.get("startDate"),
+                    "end_date": latest.get("endDate"),
+                },
             )
-            
-            if response.status_code == 200:
-                data = response.json()
-                all_results_for_room = data.get("results", [])
-                if all_results_for_room:
-                    print(f"✓ Found {len(all_results_for_room)} transcription(s) using room name variant: {variant}")
-                    # Filter for only ready transcriptions
-                    ready_results = [r for r in all_results_for_room if r.get("state") == "ready"]
-                    if ready_results:
-                        results = ready_results
-                        print(f"  Found {len(ready_results)} ready transcription(s), using most recent")
-                        print(f"  Using transcription from: {ready_results[0].get('startDate')}")
-                    else:
-                        print(f"  Found {len(all_results_for_room)} transcription(s) but none are ready yet")
-                        # Show states for debugging
-                        for r in all_results_for_room[:3]:  # Show first 3
-                            print(f"    - State: {r.get('state')}, Start: {r.get('startDate')}, End: {r.get('endDate')}")
-                        results = []  # No ready results
-                    break
-                else:
-                    print(f"  No results for variant: {variant}")
-            else:
-                print(f"  Error {response.status_code} for variant: {variant}")
-        
-        if not results or not response or response.status_code != 200:
-            print(f"WARNING: No transcriptions found for room {room_name} (tried variants: {room_name_variants})")
-            if response:
-                print(f"Last response status: {response.status_code}, text: {response.text[:500]}")
-            return None
+            return None, TRANSCRIPTION_NOT_READY, None
         
         # Get the most recent ready transcription
-        transcription = results[0]
+        transcription = ready_results[0]
         transcription_id = transcription.get("transcriptionId")
-        state = transcription.get("state")
         
-        if state != "ready":
-            print(f"WARNING: Transcription not ready (state: {state})")
-            print(f"DEBUG: Transcription details - ID: {transcription_id}, Start: {transcription.get('startDate')}, End: {transcription.get('endDate')}")
-            print(f"NOTE: Transcriptions may take a few minutes to process after the meeting ends")
-            print(f"TIP: Wait a moment and try 'End visit' again once the transcription is ready")
-            return None
+        stored = _load_stored(transcription_id)
+        if stored:
+            transcription_text = stored.text
+        else:
+            transcription_text = _fetch_transcription(transcription_id, room_name, headers)
+        if transcription_text is None:
+            return None, TRANSCRIPTION_UNAVAILABLE, None
         
-        # Get access link to download transcription
-        access_response = requests.get(
-            f"https://api.whereby.dev/v1/transcriptions/{transcription_id}/access-link",
-            headers=headers,
-            timeout=10
+        logger.info(
+            "Retrieved transcription",
+            extra={
+                "transcription_id": transcription_id,
+                "start_date": transcription.get("startDate"),
+                "stored": stored is not None,
+                "chars": len(transcription_text),
+            },
         )
-        
-        if access_response.status_code != 200:
-            print(f"WARNING: Failed to get transcription access link: {access_response.status_code}")
-            return None
-        
-        access_data = access_response.json()
-        access_link = access_data.get("accessLink")
-        
-        if not access_link:
-            print("WARNING: No access link in response")
-            return None
-        
-        # Download the transcription content
-        transcript_response = requests.get(access_link, timeout=10)
-        if transcript_response.status_code == 200:
-            transcription_text = transcript_response.text
-            print(f"SUCCESS: Retrieved transcription ({len(transcription_text)} chars)")
-            return transcription_text
-        else:
-            print(f"WARNING: Failed to download transcription: {transcript_response.status_code}")
-            return None
+        return transcription_text, TRANSCRIPTION_READY, transcription_id
             
-    except Exception as e:
-        print(f"ERROR fetching transcription: {e}")
-        return None
+    except Exception:
+        logger.exception("Error fetching transcription")
+        return None, TRANSCRIPTION_UNAVAILABLE, transcription_id
@@ -0,0 +1,235 @@
+"""Write-behind committer for visit inserts, status transitions and audit events.
+
+Requests queue their writes; a background thread applies everything queued
+within WRITE_BEHIND_INTERVAL_MS in one transaction, so many requests share
+one commit. Audit events queued after an intake or summary is committed
+(intake_finished, summary_ready, llm_fallback) return at once. barrier()
+waits for a visit's queued writes to be committed, for paths that must be
+durable or must not be overtaken (visit creation, room assignment, pharmacy
+orders, any synchronous write to the same visit). A batch that fails every commit
+attempt is retried one write at a time, and only writes that still fail
+are dropped.
+"""
+import queue
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.audit import record_events
+from app.db import SessionLocal
+from app.metrics import span
+from app.models import Visit
+from app.settings import env, env_flag
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = env_flag("WRITE_BEHIND", "true")
+# How long the writer waits to gather more writes after the first one arrives
+WRITE_BEHIND_INTERVAL_MS = float(env("WRITE_BEHIND_INTERVAL_MS", "5"))
+WRITE_BEHIND_MAX_BATCH = int(env("WRITE_BEHIND_MAX_BATCH", "500"))
+WRITE_BEHIND_COMMIT_ATTEMPTS = int(env("WRITE_BEHIND_COMMIT_ATTEMPTS", "3"))
+# Upper bound on how long barrier() blocks a request
+WRITE_BEHIND_BARRIER_TIMEOUT = float(env("WRITE_BEHIND_BARRIER_TIMEOUT", "5"))
+# How long a failed write is reported to barrier() callers before it is forgotten
+WRITE_BEHIND_FAILURE_TTL = float(env("WRITE_BEHIND_FAILURE_TTL", "300"))
+
+
+class _Write:
+    __slots__ = ("seq", "visit_id", "values", "events", "create")
+
+    def __init__(self, seq: int, visit_id: str, values: Optional[Dict[str, Any]],
+                 events: List[Tuple[str, str, datetime]], create: bool):
+        self.seq = seq
+        self.visit_id = visit_id
+        self.values = values
+        self.events = events
+        self.create = create
+
+
+class WriteBehind:
+    """Single writer thread draining a queue of visit updates into group commits."""
+
+    def __init__(self, interval_ms: float = WRITE_BEHIND_INTERVAL_MS, max_batch: int = WRITE_BEHIND_MAX_BATCH):
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Condition()
+        self._seq = 0
+        self._committed_seq = 0
+        # Highest queued seq per visit, so a barrier for one visit only waits when it has writes pending
+        self._pending: Dict[str, int] = {}
+        # Visits with a queued write that could not be committed, and when it was dropped
+        self._failed_visits: Dict[str, float] = {}
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None and WRITE_BEHIND:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Commit everything queued, then stop the writer."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, db: Session, visit_id: str, values: Optional[Dict[str, Any]] = None,
+               events: Iterable[str] = (), create: bool = False) -> None:
+        """Queue a visit update (or, with create=True, an INSERT) and audit events.
+
+        Without a running writer (WRITE_BEHIND=false, or no app lifespan) the
+        writes go into `db` instead and the caller's commit applies them.
+        """
+        now = datetime.utcnow()
+        rows = [(visit_id, event_type, now) for event_type in events]
+        if not self.running:
+            if create:
+                db.execute(insert(Visit).values(id=visit_id, **(values or {})))
+            elif values:
+                db.query(Visit).filter(Visit.id == visit_id).update(values, synchronize_session=False)
+            record_events(db, rows)
+            return
+        # Enqueue under the lock so queue order matches seq order
+        with self._done:
+            self._seq += 1
+            self._pending[visit_id] = self._seq
+            self._queue.put(_Write(self._seq, visit_id, values, rows, create))
+
+    def barrier(self, visit_id: Optional[str] = None, timeout: float = WRITE_BEHIND_BARRIER_TIMEOUT) -> bool:
+        """Block until queued writes (for `visit_id`, or all) are committed.
+
+        Returns False on timeout, or when the visit's writes were dropped.
+        This blocks the calling thread; call it from async code via run_in_threadpool.
+        """
+        with self._done:
+            target = self._pending.get(visit_id, 0) if visit_id is not None else self._seq
+            if target > self._committed_seq:
+                if not self._done.wait_for(lambda: self._committed_seq >= target, timeout=timeout):
+                    return False
+            if visit_id is None:
+                return True
+            return self._failed_visits.pop(visit_id, None) is None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "writes": self.writes,
+            "failed": self.failed,
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch: List[_Write]) -> None:
+        # New visits go in one executemany INSERT; later updates to the same visit win, one UPDATE per visit
+        inserts = [{"id": write.visit_id, **(write.values or {})} for write in batch if write.create]
+        updates: Dict[str, Dict[str, Any]] = {}
+        events = []
+        for write in batch:
+            if write.values and not write.create:
+                updates.setdefault(write.visit_id, {}).update(write.values)
+            events.extend(write.events)
+        # Bulk UPDATE by primary key needs the same columns in every row of an executemany
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for visit_id, values in updates.items():
+            groups.setdefault(tuple(sorted(values)), []).append({"id": visit_id, **values})
+
+        for attempt in range(1, WRITE_BEHIND_COMMIT_ATTEMPTS + 1):
+            db = SessionLocal()
+            try:
+                with span("db", "group_commit"):
+                    if inserts:
+                        db.execute(insert(Visit), inserts)
+                    for rows in groups.values():
+                        db.execute(update(Visit), rows)
+                    record_events(db, events)
+                    db.commit()
+                self.batches += 1
+                self.writes += len(batch)
+                break
+            except Exception:
+                db.rollback()
+                if attempt == WRITE_BEHIND_COMMIT_ATTEMPTS:
+                    logger.warning(
+                        "Write-behind batch failed, committing its writes one by one",
+                        extra={"writes": len(batch)}, exc_info=True,
+                    )
+                    self._commit_each(batch)
+                else:
+                    time.sleep(0.01 * attempt)
+            finally:
+                db.close()
+
+        last = batch[-1].seq
+        with self._done:
+            self._committed_seq = last
+            for write in batch:
+                if self._pending.get(write.visit_id) == write.seq:
+                    del self._pending[write.visit_id]
+            self._done.notify_all()
+
+    def _commit_each(self, batch: List[_Write]) -> None:
+        """Commit each write in its own transaction, so one bad write doesn't take the batch down with it."""
+        failed: Set[str] = set()
+        for write in batch:
+            # A later write for a visit must not land without the one before it
+            if write.visit_id in failed:
+                self.failed += 1
+                continue
+            db = SessionLocal()
+            try:
+                if write.create:
+                    db.execute(insert(Visit).values(id=write.visit_id, **(write.values or {})))
+                elif write.values:
+                    db.execute(update(Visit).where(Visit.id == write.visit_id).values(**write.values))
+                record_events(db, write.events)
+                db.commit()
+                self.writes += 1
+            except Exception:
+                db.rollback()
+                self.failed += 1
+                failed.add(write.visit_id)
+                logger.exception("Write-behind write dropped", extra={"visit_id": write.visit_id})
+            finally:
+                db.close()
+        now = time.monotonic()
+        with self._done:
+            # Entries no barrier asked about expire instead of accumulating
+            for visit_id, failed_at in list(self._failed_visits.items()):
+                if now - failed_at > WRITE_BEHIND_FAILURE_TTL:
+                    del self._failed_visits[visit_id]
+            self._failed_visits.update((visit_id, now) for visit_id in failed)
+
+
+write_behind = WriteBehind()
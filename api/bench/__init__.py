@@ -0,0 +1 @@
+# ReproCare API benchmarks
@@ -0,0 +1,121 @@
+"""A class lets out: many POST /intake_to_json at once against a rate-limited provider.
+
+Runs the API in-process against a stub LLM that answers 429 over `--rpm`,
+first without admission control and then with token buckets set to the same
+limit. Reports status codes, provider calls and latency per outcome, and the
+admission wait and queue metrics. Run from the api/ directory:
+
+    python -m bench.admission --students 120 --rpm 60
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+STUB_PORT = 9114
+
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}/v1/chat/completions"
+os.environ["LLM_API_KEY"] = "bench"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+import httpx  # noqa: E402
+
+from app import llm  # noqa: E402
+from app.admission import (  # noqa: E402
+    AdmissionController, QUEUE_DEPTH_METRIC, REJECTED_METRIC, WAIT_METRIC,
+    REJECT_OVER_BUDGET, REJECT_QUEUE_FULL, REJECT_TIMEOUT,
+)
+from app.db import init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.metrics import Histogram, registry  # noqa: E402
+from bench.intake_batch import intake  # noqa: E402
+from bench.stub_llm import StubServer, build_app  # noqa: E402
+
+
+def percentile(samples, q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def burst(students: int) -> list:
+    """(status, seconds, Retry-After) per request, all fired together."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        ids = [(await client.post("/visit")).json()["visit_id"] for _ in range(students)]
+        max_depth = 0
+
+        async def sample_depth():
+            nonlocal max_depth
+            while True:
+                max_depth = max(max_depth, registry.gauge(QUEUE_DEPTH_METRIC).value)
+                await asyncio.sleep(0.01)
+
+        async def post(i: int, visit_id: str):
+            start = time.perf_counter()
+            response = await client.post("/intake_to_json", json=intake(visit_id, i))
+            return response.status_code, time.perf_counter() - start, response.headers.get("retry-after")
+
+        sampler = asyncio.create_task(sample_depth())
+        results = await asyncio.gather(*[post(i, vid) for i, vid in enumerate(ids)])
+        sampler.cancel()
+    # The pooled LLM client belongs to this event loop; the next run starts a new one
+    await llm.aclose_client()
+    return results, max_depth
+
+
+def run(label: str, args, controller: AdmissionController) -> None:
+    registry.reset()
+    llm.admission = controller
+    llm.PRIMARY.breaker.record_success()
+    stub_app = build_app(latency=args.latency, rpm=args.rpm)
+    with StubServer(stub_app, STUB_PORT):
+        start = time.perf_counter()
+        results, max_depth = asyncio.run(burst(args.students))
+        elapsed = time.perf_counter() - start
+
+    print(f"\n{label}: {args.students} intakes in {elapsed:.1f}s, "
+          f"{stub_app.state.calls} provider calls ({stub_app.state.rate_limited} answered 429)")
+    by_status = {}
+    for status, seconds, _ in results:
+        by_status.setdefault(status, []).append(seconds)
+    for status, samples in sorted(by_status.items()):
+        print(f"  {status}: {len(samples):4d}  p50 {percentile(samples, 0.5) * 1000:7.0f}ms  "
+              f"p99 {percentile(samples, 0.99) * 1000:7.0f}ms")
+    retry_after = [int(value) for _, _, value in results if value]
+    if retry_after:
+        print(f"  Retry-After: {min(retry_after)}-{max(retry_after)}s")
+    if controller.enabled:
+        counts, _, count = registry.histogram(WAIT_METRIC).snapshot()
+        rejected = {
+            reason: registry.counter(REJECTED_METRIC, reason=reason).value
+            for reason in (REJECT_QUEUE_FULL, REJECT_OVER_BUDGET, REJECT_TIMEOUT)
+        }
+        print(f"  admission wait p50 {Histogram.quantile(counts, count, 0.5):.2f}s "
+              f"p99 {Histogram.quantile(counts, count, 0.99):.2f}s over {count} admitted; "
+              f"max queue depth {max_depth}; rejected {rejected}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=120)
+    parser.add_argument("--rpm", type=float, default=60, help="provider requests-per-minute limit")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--queue-max", type=int, default=30)
+    parser.add_argument("--queue-timeout", type=float, default=10)
+    args = parser.parse_args()
+
+    # ASGITransport doesn't run the lifespan, so create the schema here
+    init_db()
+    run("no admission control", args, AdmissionController(rpm=0, tpm=0))
+    run("admission control", args, AdmissionController(
+        rpm=args.rpm, tpm=0, max_queue=args.queue_max, timeout=args.queue_timeout,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Mixed read/write throughput against SQLite with and without WAL pragmas.
+
+Run from the api/ directory:
+
+    python -m bench.db_mixed_load --threads 16 --seconds 5 --write-ratio 0.2
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.audit import record_event
+from app.db import create_db_engine, sqlite_pragmas
+from app.models import Base, Visit
+
+# Pre-change behaviour: rollback journal and full sync; the driver keeps its 5 s busy wait
+DEFAULT_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def run(label: str, pragmas: dict, threads: int, seconds: float, write_ratio: float, seed_visits: int) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "load.sqlite")
+    engine = create_db_engine(f"sqlite:///{path}", pragmas=pragmas)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        ids = [str(uuid.uuid4()) for _ in range(seed_visits)]
+        db.add_all(Visit(id=vid, status="created") for vid in ids)
+        db.commit()
+
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> None:
+        rng = random.Random()
+        local = {"reads": 0, "writes": 0, "locked": 0}
+        while time.perf_counter() < deadline:
+            vid = rng.choice(ids)
+            db = Session()
+            try:
+                if rng.random() < write_ratio:
+                    db.query(Visit).filter(Visit.id == vid).update({"status": "intake_complete"})
+                    record_event(db, vid, "intake_finished")
+                    db.commit()
+                    local["writes"] += 1
+                else:
+                    db.query(Visit).filter(Visit.id == vid).first()
+                    db.rollback()
+                    local["reads"] += 1
+            except OperationalError:
+                db.rollback()
+                local["locked"] += 1
+            finally:
+                db.close()
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    engine.dispose()
+
+    total = counts["reads"] + counts["writes"]
+    print(
+        f"{label:<22} {total / seconds:8.0f} ops/s  "
+        f"(reads {counts['reads'] / seconds:7.0f}/s, writes {counts['writes'] / seconds:6.0f}/s, "
+        f"'database is locked' errors {counts['locked']})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--visits", type=int, default=1000)
+    args = parser.parse_args()
+
+    run("before (rollback journal)", DEFAULT_PRAGMAS, args.threads, args.seconds, args.write_ratio, args.visits)
+    run("after (WAL pragmas)", sqlite_pragmas(), args.threads, args.seconds, args.write_ratio, args.visits)
+
+
+if __name__ == "__main__":
+    main()
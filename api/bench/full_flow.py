@@ -0,0 +1,264 @@
+"""Load test of the whole visit flow against local LLM and Whereby stand-ins.
+
+Each simulated patient runs POST /visit -> /intake_to_json -> /create_room ->
+/post_visit_explain (and waits for the job) -> /pharmacy_order -> GET /visit/{id}.
+The API runs under uvicorn in a subprocess; the stand-ins run in this process.
+Run from the api/ directory:
+
+    python -m bench.full_flow --visits 200 --concurrency 20
+    python -m bench.full_flow --llm-error-rate 0.05 --whereby-error-rate 0.05
+
+Results are compared with bench/baselines/full_flow.json when the run
+configuration matches; --save-baseline overwrites it. The exit status is 1
+when any step's p95 regressed by more than --tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from bench import stub_llm, stub_whereby
+from bench.post_visit_map_reduce import fake_transcript
+
+API_PORT = 9106
+LLM_PORT = 9107
+WHEREBY_PORT = 9108
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "full_flow.json"
+
+STEPS = ["create_visit", "intake", "create_room", "post_visit", "post_visit_job", "pharmacy", "get_visit"]
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def api_env(args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite",
+        "LOG_LEVEL": "WARNING",
+        "LLM_BASE_URL": f"http://127.0.0.1:{LLM_PORT}/v1/chat/completions",
+        "LLM_API_KEY": "bench",
+        "WHEREBY_API_KEY": "bench",
+        "WHEREBY_ROOM_TEMPLATE_ID": "",
+        "WHEREBY_MEETINGS_URL": f"http://127.0.0.1:{WHEREBY_PORT}/v1/meetings",
+        "WHEREBY_API_BASE": f"http://127.0.0.1:{WHEREBY_PORT}/v1",
+        "ROOM_POOL_SIZE": str(args.room_pool),
+        # Failed summary jobs retry within the run instead of minutes later
+        "JOB_RETRY_BASE_SECONDS": "1",
+        "JOB_RETRY_MAX_SECONDS": "5",
+    })
+    return env
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, step: str, request) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.errors[step] += 1
+            return None
+        self.latencies[step].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[step] += 1
+            return None
+        return response
+
+
+async def wait_for_job(client: httpx.AsyncClient, job_id: str, timeout: float) -> Optional[str]:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            job = (await client.get(f"/jobs/{job_id}")).json()
+        except httpx.TransportError:
+            # A pooled keep-alive connection the server just closed; the next poll reconnects
+            job = {"status": None}
+        if job["status"] in ("succeeded", "failed"):
+            return job["status"]
+        await asyncio.sleep(0.05)
+    return None
+
+
+async def patient(client: httpx.AsyncClient, recorder: Recorder, n: int, job_timeout: float) -> bool:
+    response = await recorder.call("create_visit", client.post("/visit"))
+    if response is None:
+        return False
+    visit_id = response.json()["visit_id"]
+
+    # Vary the answers so intakes miss the LLM response cache
+    qa = [
+        {"q": "What brings you in today?", "a": random.choice(["Birth control", "Missed period", "Refill"])},
+        {"q": "How old are you?", "a": str(18 + n % 30)},
+        {"q": "When was your last period?", "a": f"{1 + n % 28} days ago"},
+    ]
+    response = await recorder.call("intake", client.post("/intake_to_json", json={"visit_id": visit_id, "qa": qa}))
+    if response is None:
+        return False
+    intake = response.json()
+
+    if await recorder.call("create_room", client.post("/create_room", json={"visit_id": visit_id})) is None:
+        return False
+
+    start = time.perf_counter()
+    response = await recorder.call("post_visit", client.post("/post_visit_explain", json={
+        "visit_id": visit_id,
+        "provider_note": intake["provider_note"],
+        "intake_structured": intake["intake_structured"],
+    }))
+    if response is None:
+        return False
+    status = await wait_for_job(client, response.json()["job_id"], job_timeout)
+    if status != "succeeded":
+        recorder.errors["post_visit_job"] += 1
+        return False
+    recorder.latencies["post_visit_job"].append(time.perf_counter() - start)
+
+    response = await recorder.call("pharmacy", client.post("/pharmacy_order", json={
+        "visit_id": visit_id,
+        "shipping": {"name": f"Patient {n}", "address": "1 Bench St"},
+        "plan": "monthly",
+    }))
+    if response is None:
+        return False
+    return await recorder.call("get_visit", client.get(f"/visit/{visit_id}")) is not None
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{API_PORT}", limits=limits, timeout=120) as client:
+        async def one(n: int) -> bool:
+            async with semaphore:
+                return await patient(client, recorder, n, args.job_timeout)
+
+        start = time.perf_counter()
+        completed = await asyncio.gather(*[one(n) for n in range(args.visits)])
+        elapsed = time.perf_counter() - start
+
+    steps = {}
+    for step in STEPS:
+        samples = recorder.latencies.get(step, [])
+        steps[step] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(step, 0),
+            "p50_ms": round(percentile(samples, 0.5) * 1000, 1) if samples else None,
+            "p95_ms": round(percentile(samples, 0.95) * 1000, 1) if samples else None,
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 1) if samples else None,
+            "max_ms": round(max(samples) * 1000, 1) if samples else None,
+        }
+    return {
+        "completed": sum(completed),
+        "elapsed_s": round(elapsed, 2),
+        "flows_per_s": round(sum(completed) / elapsed, 2),
+        "steps": steps,
+    }
+
+
+def start_api(args) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(API_PORT), "--log-level", "warning"],
+        env=api_env(args), stdout=subprocess.DEVNULL,
+    )
+    while True:
+        try:
+            if httpx.get(f"http://127.0.0.1:{API_PORT}/", timeout=1).status_code == 200:
+                return process
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited before serving")
+        time.sleep(0.05)
+
+
+def report(result: dict, baseline: Optional[dict], tolerance: float) -> bool:
+    """Print the results; returns True when a step's p95 regressed past the tolerance."""
+    print(f"{result['completed']} flows in {result['elapsed_s']}s ({result['flows_per_s']} flows/s)")
+    if baseline:
+        print(f"baseline: {baseline['flows_per_s']} flows/s")
+    print(f"{'step':<16}{'count':>7}{'errors':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  vs baseline p95")
+    regressed = False
+    for step, row in result["steps"].items():
+        cells = "".join(f"{row[key]:>8.1f}ms" if row[key] is not None else f"{'-':>10}"
+                        for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        delta = ""
+        base = (baseline or {}).get("steps", {}).get(step, {}).get("p95_ms")
+        if base and row["p95_ms"] is not None:
+            change = row["p95_ms"] / base - 1
+            delta = f"{change:+.0%}"
+            if change > tolerance:
+                delta += "  REGRESSION"
+                regressed = True
+        print(f"{step:<16}{row['count']:>7}{row['errors']:>8}{cells}  {delta}")
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--visits", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--whereby-latency", type=float, default=0.1)
+    parser.add_argument("--whereby-error-rate", type=float, default=0.0)
+    parser.add_argument("--transcript-minutes", type=int, default=10)
+    parser.add_argument("--room-pool", type=int, default=5, help="ROOM_POOL_SIZE for the API; 0 disables the pool")
+    parser.add_argument("--job-timeout", type=float, default=60, help="seconds to wait for a summary job")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 growth over the baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("tolerance", "baseline", "save_baseline")}
+    llm_app = stub_llm.build_app(args.llm_latency, error_rate=args.llm_error_rate)
+    whereby_app = stub_whereby.build_app(
+        args.whereby_latency, error_rate=args.whereby_error_rate,
+        meeting_transcript=fake_transcript(args.transcript_minutes),
+    )
+    with stub_llm.StubServer(llm_app, LLM_PORT), stub_llm.StubServer(whereby_app, WHEREBY_PORT):
+        api = start_api(args)
+        try:
+            result = asyncio.run(run(args))
+        finally:
+            api.terminate()
+            api.wait()
+    result = {"config": config, **result}
+
+    baseline = None
+    if args.baseline.is_file():
+        saved = json.loads(args.baseline.read_text())
+        if saved.get("config") == config:
+            baseline = saved
+        else:
+            print(f"{args.baseline} was recorded with different settings; not comparing")
+    regressed = report(result, baseline, args.tolerance)
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"saved baseline to {args.baseline}")
+    elif regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
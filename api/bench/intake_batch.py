@@ -0,0 +1,90 @@
+"""Visits per second: one POST /intake_to_json per visit vs POST /intake_to_json/batch.
+
+Runs the API in-process against a local stub LLM. Run from the api/ directory:
+
+    python -m bench.intake_batch --visits 1000 --latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+STUB_PORT = 9100
+
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}/v1/chat/completions"
+os.environ["LLM_API_KEY"] = "bench"
+# Every intake is unique here, so the response cache would only add noise
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+
+import httpx  # noqa: E402
+
+from app.db import init_db  # noqa: E402
+from app.main import app, INTAKE_BATCH_CONCURRENCY  # noqa: E402
+from bench.stub_llm import StubServer, build_app  # noqa: E402
+
+
+def intake(visit_id: str, n: int) -> dict:
+    return {
+        "visit_id": visit_id,
+        "qa": [
+            {"q": "What brings you in today?", "a": "Birth control"},
+            {"q": "How old are you?", "a": str(18 + n % 10)},
+            {"q": "Do you smoke?", "a": "No"},
+        ],
+    }
+
+
+async def create_visits(client: httpx.AsyncClient, n: int) -> list:
+    return [(await client.post("/visit")).json()["visit_id"] for _ in range(n)]
+
+
+async def bench_single(client: httpx.AsyncClient, n: int, concurrency: int) -> float:
+    """Per-visit requests, with the same concurrency the batch endpoint uses."""
+    ids = await create_visits(client, n)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(i: int, visit_id: str):
+        async with semaphore:
+            await client.post("/intake_to_json", json=intake(visit_id, i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[post(i, vid) for i, vid in enumerate(ids)])
+    return time.perf_counter() - start
+
+
+async def bench_batch(client: httpx.AsyncClient, n: int, batch_size: int) -> float:
+    ids = await create_visits(client, n)
+    start = time.perf_counter()
+    for offset in range(0, n, batch_size):
+        items = [intake(vid, offset + i) for i, vid in enumerate(ids[offset:offset + batch_size])]
+        response = await client.post("/intake_to_json/batch", json={"items": items})
+        response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(args) -> None:
+    # ASGITransport doesn't run the lifespan, so create the schema here
+    init_db()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=600) as client:
+        elapsed = await bench_single(client, args.visits, INTAKE_BATCH_CONCURRENCY)
+        print(f"single requests ({INTAKE_BATCH_CONCURRENCY} in flight)  {args.visits / elapsed:8.1f} visits/s")
+        elapsed = await bench_batch(client, args.visits, args.batch_size)
+        print(f"batch endpoint ({args.batch_size} per call)     {args.visits / elapsed:8.1f} visits/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--visits", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    with StubServer(build_app(args.latency), STUB_PORT):
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Tail latency of achat() with and without hedging against a slow-tailed provider.
+
+The primary stub answers most calls in `--latency` seconds but a `--slow-rate`
+fraction take `--slow-latency`; the hedge stub is a healthy second endpoint.
+Run from the api/ directory:
+
+    python -m bench.llm_tail_latency --calls 400 --slow-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+PRIMARY_PORT = 9110
+HEDGE_PORT = 9111
+
+# Point the app at the local stubs before app.llm reads its settings
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{PRIMARY_PORT}/v1/chat/completions"
+os.environ["LLM_API_KEY"] = "bench"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+
+from app import llm  # noqa: E402
+from bench.stub_llm import StubServer, build_app  # noqa: E402
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(calls: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await llm.achat("intake", f"Q and A {i}")
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(i) for i in range(calls)])
+    await llm.aclose_client()
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    print(
+        f"{label:<10} p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:7.1f}ms  "
+        f"max {max(latencies) * 1000:7.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.1, help="typical primary latency in seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of slow primary calls")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="slow primary latency in seconds")
+    args = parser.parse_args()
+
+    primary_app = build_app(args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    with StubServer(primary_app, PRIMARY_PORT), StubServer(build_app(args.latency), HEDGE_PORT) as hedge:
+        llm.HEDGE = None
+        report("no hedge", asyncio.run(run(args.calls, args.concurrency)))
+
+        llm.PRIMARY = llm.LLMEndpoint("primary", llm.LLM_BASE_URL, llm.LLM_API_KEY, llm.LLM_MODEL)
+        llm.HEDGE = llm.LLMEndpoint("hedge", f"{hedge.url}/v1/chat/completions", llm.LLM_API_KEY, llm.LLM_MODEL)
+        report("hedged", asyncio.run(run(args.calls, args.concurrency)))
+        print(f"hedge delay settled at {llm.PRIMARY.hedge_delay() * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
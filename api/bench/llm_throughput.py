@@ -0,0 +1,93 @@
+"""Throughput of the sync vs pooled async LLM path at high concurrency.
+
+Run from the api/ directory:
+
+    python -m bench.llm_throughput --concurrency 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+STUB_PORT = 9100
+API_PORT = 9101
+
+# Point the app at the local stub before app.llm reads its settings
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}/v1/chat/completions"
+os.environ["LLM_API_KEY"] = "bench"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+
+import httpx  # noqa: E402
+
+from app import llm  # noqa: E402
+from bench.stub_llm import StubServer, build_app  # noqa: E402
+
+INTAKE_QA = [
+    {"q": "What brings you in today?", "a": "Birth control"},
+    {"q": "How old are you?", "a": "20"},
+    {"q": "Do you smoke?", "a": "No"},
+]
+
+
+def report(label: str, n: int, elapsed: float) -> None:
+    print(f"{label:<38} {n} calls in {elapsed:6.2f}s  ->  {n / elapsed:7.1f} req/s")
+
+
+def bench_sync_chat(n: int, workers: int) -> None:
+    """Blocking chat() on a thread pool, as the old sync endpoints ran."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda _: llm.chat("intake", "Q and A"), range(n)))
+    report(f"sync chat() ({workers} threads)", n, time.perf_counter() - start)
+
+
+async def bench_async_chat(n: int) -> None:
+    await asyncio.gather(*[llm.achat("intake", "Q and A") for _ in range(n)])  # warm the pool
+    start = time.perf_counter()
+    await asyncio.gather(*[llm.achat("intake", "Q and A") for _ in range(n)])
+    report("async achat() (pooled)", n, time.perf_counter() - start)
+    await llm.aclose_client()
+
+
+async def bench_intake_endpoint(base_url: str, n: int) -> None:
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        visit_ids = [
+            (await client.post("/visit")).json()["visit_id"] for _ in range(n)
+        ]
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/intake_to_json", json={"visit_id": vid, "qa": INTAKE_QA})
+            for vid in visit_ids
+        ])
+        elapsed = time.perf_counter() - start
+    failed = sum(1 for r in responses if r.status_code != 200)
+    report("POST /intake_to_json end to end", n, elapsed)
+    if failed:
+        print(f"  {failed} requests failed")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub LLM latency in seconds")
+    parser.add_argument("--threads", type=int, default=40, help="size of the sync thread pool")
+    args = parser.parse_args()
+
+    # Let the async pool open one connection per in-flight request
+    llm.LLM_MAX_CONNECTIONS = args.concurrency
+    llm.LLM_MAX_KEEPALIVE_CONNECTIONS = args.concurrency
+
+    with StubServer(build_app(args.latency), STUB_PORT):
+        bench_sync_chat(args.concurrency, args.threads)
+        asyncio.run(bench_async_chat(args.concurrency))
+
+        from app.main import app
+        with StubServer(app, API_PORT) as api:
+            asyncio.run(bench_intake_endpoint(api.url, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Wall time of the post-visit summary for a long transcript.
+
+Compares chunk notes generated one at a time with the concurrent map step,
+and a re-run served from the chunk summary cache. Run from the api/ directory:
+
+    python -m bench.post_visit_map_reduce --minutes 30 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+STUB_PORT = 9102
+
+# Point the app at the local stub before app.llm reads its settings
+os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{STUB_PORT}/v1/chat/completions"
+os.environ["LLM_API_KEY"] = "bench"
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+
+from app import llm, post_visit  # noqa: E402
+from app.chunking import count_tokens  # noqa: E402
+from bench.stub_llm import StubServer, build_app  # noqa: E402
+
+PHRASES = [
+    "How have you been feeling since we last spoke?",
+    "I've been taking the pill every morning, but I missed two days last week.",
+    "That's okay, take it as soon as you remember and use a backup method for seven days.",
+    "Have you had any headaches, chest pain or leg swelling?",
+    "Some spotting between periods, but nothing else.",
+    "Spotting is common in the first three months and usually settles down.",
+    "We'll check in again at your follow up on the fifteenth.",
+]
+
+
+def fake_transcript(minutes: int) -> str:
+    """About 150 spoken words a minute, alternating speakers."""
+    lines = []
+    for second in range(0, minutes * 60, 6):
+        speaker = "Provider" if len(lines) % 2 == 0 else "Patient"
+        lines.append(f"[{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}] {speaker}: {random.choice(PHRASES)}")
+    return "\n".join(lines)
+
+
+async def run(transcript: str, sequential: bool) -> float:
+    if sequential:
+        post_visit.POST_VISIT_MAP_CONCURRENCY = 1
+    start = time.perf_counter()
+    prompt, _ = await post_visit.prepare_post_visit_prompts(transcript, "", {}, "bench-transcript")
+    await llm.achat(*prompt)
+    elapsed = time.perf_counter() - start
+    post_visit.POST_VISIT_MAP_CONCURRENCY = 8
+    await llm.aclose_client()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=int, default=30, help="length of the synthetic visit")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub LLM latency in seconds")
+    args = parser.parse_args()
+
+    transcript = fake_transcript(args.minutes)
+    chunks = len(post_visit.chunk_text(transcript, post_visit.POST_VISIT_CHUNK_TOKENS))
+    print(f"transcript: {count_tokens(transcript)} tokens, {chunks} chunks of <= {post_visit.POST_VISIT_CHUNK_TOKENS}")
+
+    with StubServer(build_app(args.latency), STUB_PORT):
+        print(f"sequential map + reduce   {asyncio.run(run(transcript, sequential=True)):6.2f}s")
+        post_visit.chunk_summary_cache.clear()
+        print(f"concurrent map + reduce   {asyncio.run(run(transcript, sequential=False)):6.2f}s")
+        print(f"re-run (cached chunks)    {asyncio.run(run(transcript, sequential=False)):6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
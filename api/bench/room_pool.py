@@ -0,0 +1,79 @@
+"""/create_room latency with and without the pre-provisioned room pool.
+
+Runs the API in-process against a stub Whereby meetings API. Run from the api/ directory:
+
+    python -m bench.room_pool --requests 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+WHEREBY_PORT = 9104
+
+# Point the app at the local stub before app.whereby reads its settings
+os.environ["WHEREBY_MEETINGS_URL"] = f"http://127.0.0.1:{WHEREBY_PORT}/v1/meetings"
+os.environ["WHEREBY_API_KEY"] = "bench"
+os.environ["WHEREBY_ROOM_TEMPLATE_ID"] = ""
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+
+import httpx  # noqa: E402
+
+from app.db import init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.room_pool import room_pool  # noqa: E402
+from bench.stub_llm import StubServer  # noqa: E402
+from bench.stub_whereby import build_app  # noqa: E402
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(requests: int, interval: float, pooled: bool) -> list:
+    room_pool.size = requests if pooled else 0
+    if pooled:
+        await room_pool.start()
+        while room_pool.stats()["ready"] < min(requests, 5):
+            await asyncio.sleep(0.05)
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests):
+            visit_id = (await client.post("/visit")).json()["visit_id"]
+            start = time.perf_counter()
+            response = await client.post("/create_room", json={"visit_id": visit_id})
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+            # Patients arrive spread out, giving the pool time to refill
+            await asyncio.sleep(interval)
+    await room_pool.stop()
+    return latencies
+
+
+def report(label: str, latencies: list) -> None:
+    print(
+        f"{label:<10} p50 {percentile(latencies, 0.5) * 1000:7.1f}ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.1f}ms  max {max(latencies) * 1000:7.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub meetings API latency in seconds")
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between patients")
+    args = parser.parse_args()
+
+    # ASGITransport doesn't run the lifespan, so create the schema here
+    init_db()
+    with StubServer(build_app(args.latency), WHEREBY_PORT):
+        report("sync", asyncio.run(run(args.requests, args.interval, pooled=False)))
+        report("pooled", asyncio.run(run(args.requests, args.interval, pooled=True)))
+        print(room_pool.stats())
+
+
+if __name__ == "__main__":
+    main()
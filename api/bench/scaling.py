@@ -0,0 +1,135 @@
+"""Throughput of GET /visit/{id} and /intake_to_json as uvicorn workers are added.
+
+Each worker count gets a fresh database and a `python -m app.serve` process.
+The LLM stand-in and the load generators run in their own processes, so the
+server processes have the cores to themselves as far as possible. Run from
+the api/ directory:
+
+    python -m bench.scaling --workers 1,2,4 --seconds 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+from app.serve import available_cpus
+
+API_PORT = 9112
+LLM_PORT = 9113
+
+
+def run_llm_stub(latency: float) -> None:
+    from bench.stub_llm import build_app
+    import uvicorn
+
+    uvicorn.run(build_app(latency), host="127.0.0.1", port=LLM_PORT, log_level="warning", backlog=4096)
+
+
+def wait_until_up(url: str, process) -> None:
+    while True:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        if process.poll() is not None if hasattr(process, "poll") else not process.is_alive():
+            raise RuntimeError(f"{url} exited before serving")
+        time.sleep(0.05)
+
+
+def start_api(workers: int) -> subprocess.Popen:
+    data_dir = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{data_dir}/bench.sqlite",
+        "SHARED_CACHE_PATH": f"{data_dir}/llm_cache.sqlite",
+        "LOG_LEVEL": "WARNING",
+        "LLM_BASE_URL": f"http://127.0.0.1:{LLM_PORT}/v1/chat/completions",
+        "LLM_API_KEY": "bench",
+        "WHEREBY_API_KEY": "",
+        "ROOM_POOL_SIZE": "0",
+    })
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(API_PORT)],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    wait_until_up(f"http://127.0.0.1:{API_PORT}/", process)
+    return process
+
+
+async def _drive(kind: str, visit_ids: List[str], client_index: int, concurrency: int, seconds: float) -> int:
+    done = 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{API_PORT}", limits=limits, timeout=30) as client:
+        async def loop(worker: int) -> None:
+            nonlocal done
+            n = 0
+            while time.perf_counter() < deadline:
+                visit_id = visit_ids[(worker + n) % len(visit_ids)]
+                if kind == "get_visit":
+                    response = await client.get(f"/visit/{visit_id}")
+                else:
+                    # Distinct answers so every call reaches the LLM stand-in
+                    qa = [{"q": "How old are you?", "a": f"{client_index}-{worker}-{n}"}]
+                    response = await client.post("/intake_to_json", json={"visit_id": visit_id, "qa": qa})
+                response.raise_for_status()
+                done += 1
+                n += 1
+
+        await asyncio.gather(*[loop(worker) for worker in range(concurrency)])
+    return done
+
+
+def drive(task) -> int:
+    return asyncio.run(_drive(*task))
+
+
+def measure(kind: str, visit_ids: List[str], clients: int, concurrency: int, seconds: float) -> float:
+    with multiprocessing.Pool(clients) as pool:
+        counts = pool.map(drive, [(kind, visit_ids, index, concurrency, seconds) for index in range(clients)])
+    return sum(counts) / seconds
+
+
+def main() -> None:
+    cpus = available_cpus()
+    default_workers = ",".join(str(n) for n in (1, 2, 4, 8, 16) if n <= cpus) or "1"
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=default_workers, help="comma-separated worker counts")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=max(1, cpus // 2), help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight per load generator")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="0 makes intake CPU-bound in the API")
+    args = parser.parse_args()
+
+    stub = multiprocessing.Process(target=run_llm_stub, args=(args.llm_latency,), daemon=True)
+    stub.start()
+    wait_until_up(f"http://127.0.0.1:{LLM_PORT}/docs", stub)
+    print(f"{cpus} CPUs available, {args.clients} load generator process(es)")
+    print(f"{'workers':>7} {'GET /visit/s':>13} {'scaling':>8} {'intake/s':>10} {'scaling':>8}")
+    base = None
+    try:
+        for workers in [int(n) for n in args.workers.split(",")]:
+            api = start_api(workers)
+            try:
+                visit_ids = [httpx.post(f"http://127.0.0.1:{API_PORT}/visit").json()["visit_id"] for _ in range(200)]
+                get_rps = measure("get_visit", visit_ids, args.clients, args.concurrency, args.seconds)
+                intake_rps = measure("intake", visit_ids, args.clients, args.concurrency, args.seconds)
+            finally:
+                api.terminate()
+                api.wait()
+            base = base or (get_rps, intake_rps)
+            print(f"{workers:>7} {get_rps:>13.0f} {get_rps / base[0]:>7.2f}x {intake_rps:>10.0f} {intake_rps / base[1]:>7.2f}x")
+    finally:
+        stub.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Cold start: import time of app.main and process start to first response.
+
+Each run is a fresh interpreter, against either a new SQLite file or one that
+an earlier run already initialised (a restart or scale-out). Run from the api/ directory:
+
+    python -m bench.startup --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PORT = 9105
+
+
+def fresh_env(database_url: str = None) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url or f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite"
+    env["LOG_LEVEL"] = "WARNING"
+    return env
+
+
+def import_time() -> float:
+    """Cumulative `-X importtime` microseconds for app.main, in seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=fresh_env(), capture_output=True, text=True, check=True,
+    )
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| app\.main$", line)
+        if match:
+            return int(match.group(1)) / 1e6
+    raise RuntimeError("app.main not found in -X importtime output")
+
+
+def slowest_imports(limit: int) -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        env=fresh_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$", line)
+        # Top-level imports made by app modules, plus the app modules themselves
+        if match and (match.group(4).startswith("app.") or len(match.group(3)) <= 2):
+            rows.append((int(match.group(2)), match.group(4)))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def first_response(database_url: str = None) -> float:
+    """Seconds from spawning uvicorn to the first 200 from GET /."""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--log-level", "warning"],
+        env=fresh_env(database_url), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                if httpx.get(f"http://127.0.0.1:{PORT}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving")
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [import_time() for _ in range(args.runs)]
+    starts = [first_response() for _ in range(args.runs)]
+    existing = f"sqlite:///{tempfile.mkdtemp()}/existing.sqlite"
+    first_response(existing)
+    restarts = [first_response(existing) for _ in range(args.runs)]
+    print(f"import app.main                  median {statistics.median(imports) * 1000:7.1f}ms")
+    print(f"spawn to first 200, new db       median {statistics.median(starts) * 1000:7.1f}ms")
+    print(f"spawn to first 200, existing db  median {statistics.median(restarts) * 1000:7.1f}ms")
+    print("slowest top-level imports (cumulative):")
+    for micros, name in slowest_imports(10):
+        print(f"  {micros / 1000:7.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
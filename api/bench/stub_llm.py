@@ -0,0 +1,97 @@
+"""Local stand-in for an OpenAI-compatible chat completions endpoint."""
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.llm import _get_stub_response
+from app.resilience import TokenBucket
+
+
+def build_app(
+    latency: float = 0.5, error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 5.0,
+    rpm: float = 0.0,
+) -> FastAPI:
+    """Return an app that answers /v1/chat/completions after `latency` seconds.
+
+    A `slow_rate` fraction of calls take `slow_latency` instead, and an
+    `error_rate` fraction fail with 503, to exercise tail latency and retries.
+    With `rpm`, calls over that rate get 429 with Retry-After, like a provider's
+    rate limit. `app.state.calls` and `app.state.rate_limited` count requests.
+    """
+    stub = FastAPI()
+    stub.state.calls = 0
+    stub.state.rate_limited = 0
+    bucket = TokenBucket(rpm) if rpm > 0 else None
+
+    @stub.post("/v1/chat/completions")
+    async def completions(body: dict):
+        stub.state.calls += 1
+        if bucket is not None:
+            now = time.monotonic()
+            wait = bucket.wait_time(1, now)
+            if wait > 0:
+                stub.state.rate_limited += 1
+                return JSONResponse(
+                    {"error": "rate_limited"}, status_code=429, headers={"Retry-After": str(math.ceil(wait))}
+                )
+            bucket.take(1, now)
+        await asyncio.sleep(slow_latency if random.random() < slow_rate else latency)
+        if random.random() < error_rate:
+            return JSONResponse({"error": "overloaded"}, status_code=503)
+        messages = body.get("messages", [])
+        system_prompt = messages[0]["content"] if messages else ""
+        user_prompt = messages[-1]["content"] if messages else ""
+        content = _get_stub_response(system_prompt, user_prompt)
+        if body.get("stream"):
+            return StreamingResponse(_stream_chunks(content), media_type="text/event-stream")
+        return {
+            "choices": [
+                {"message": {"role": "assistant", "content": content}}
+            ]
+        }
+
+    return stub
+
+
+async def _stream_chunks(content: str, size: int = 16):
+    """Emit `content` as OpenAI-style streaming deltas."""
+    for i in range(0, len(content), size):
+        chunk = {"choices": [{"delta": {"content": content[i:i + size]}}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+class StubServer:
+    """Run an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app: FastAPI, port: int):
+        self.port = port
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+if __name__ == "__main__":
+    uvicorn.run(build_app(), host="127.0.0.1", port=9100)
@@ -0,0 +1,93 @@
+"""Local stand-in for the Whereby REST API (meetings and transcriptions)."""
+import asyncio
+import hashlib
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request, Response
+
+
+def build_app(latency: float = 0.2, transcripts: Optional[Dict[str, str]] = None,
+              error_rate: float = 0.0, meeting_transcript: Optional[str] = None) -> FastAPI:
+    """Return an app serving /v1/meetings and /v1/transcriptions after `latency` seconds.
+
+    `transcripts` maps room names to transcript text; every listed transcript is
+    ready. With `meeting_transcript`, every meeting created through the stub gets
+    that transcript. An `error_rate` fraction of calls fail with 503. Downloads
+    carry an ETag and honour If-None-Match. `stub.state.calls` counts requests
+    per route.
+    """
+    stub = FastAPI()
+    stub.state.transcripts = dict(transcripts or {})
+    stub.state.calls = {}
+
+    def count(route: str) -> None:
+        stub.state.calls[route] = stub.state.calls.get(route, 0) + 1
+
+    @stub.middleware("http")
+    async def inject_errors(request: Request, call_next):
+        if random.random() < error_rate:
+            await asyncio.sleep(latency)
+            return Response(status_code=503)
+        return await call_next(request)
+
+    @stub.post("/v1/meetings")
+    async def create_meeting(body: dict, request: Request):
+        count("create_meeting")
+        await asyncio.sleep(latency)
+        meeting_id = uuid.uuid4().hex[:10]
+        if meeting_transcript is not None:
+            stub.state.transcripts[meeting_id] = meeting_transcript
+        end_date = body.get("endDate") or (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+        return {
+            "meetingId": meeting_id,
+            "roomName": f"/{meeting_id}",
+            "roomUrl": f"{request.base_url}room/{meeting_id}",
+            "startDate": datetime.now(timezone.utc).isoformat(),
+            "endDate": end_date,
+        }
+
+    @stub.get("/v1/transcriptions")
+    async def list_transcriptions(roomName: Optional[str] = None):
+        count("list_transcriptions")
+        await asyncio.sleep(latency)
+        results = [
+            {
+                "transcriptionId": f"tr-{room.strip('/')}",
+                "roomName": f"/{room.strip('/')}",
+                "state": "ready",
+                "type": "transcription",
+                "startDate": datetime.now(timezone.utc).isoformat(),
+            }
+            for room in stub.state.transcripts
+            if roomName is None or roomName.strip("/") == room.strip("/")
+        ]
+        return {"results": results}
+
+    @stub.get("/v1/transcriptions/{transcription_id}/access-link")
+    async def access_link(transcription_id: str, request: Request):
+        count("access_link")
+        await asyncio.sleep(latency)
+        return {"accessLink": f"{request.base_url}download/{transcription_id}"}
+
+    @stub.get("/download/{transcription_id}")
+    async def download(transcription_id: str, request: Request):
+        count("download")
+        await asyncio.sleep(latency)
+        text = stub.state.transcripts.get(transcription_id[len("tr-"):])
+        if text is None:
+            return Response(status_code=404)
+        etag = '"' + hashlib.sha256(text.encode()).hexdigest()[:16] + '"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(text, media_type="text/plain", headers={"ETag": etag})
+
+    return stub
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(build_app(), host="127.0.0.1", port=9200)
@@ -0,0 +1,56 @@
+"""Transcript lookups against a stub Whereby API with and without the transcript store.
+
+Run from the api/ directory:
+
+    python -m bench.transcript_store --minutes 30 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+WHEREBY_PORT = 9103
+
+# Point the app at the local stub before app.whereby reads its settings
+os.environ["WHEREBY_API_BASE"] = f"http://127.0.0.1:{WHEREBY_PORT}/v1"
+os.environ["WHEREBY_API_KEY"] = "bench"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+
+from app import transcripts, whereby  # noqa: E402
+from app.db import init_db  # noqa: E402
+from bench.post_visit_map_reduce import fake_transcript  # noqa: E402
+from bench.stub_llm import StubServer  # noqa: E402
+from bench.stub_whereby import build_app  # noqa: E402
+
+
+def timed(label: str, room: str, calls: dict, transcription_id=None):
+    before = sum(calls.values())
+    start = time.perf_counter()
+    text, state, transcription_id = whereby.lookup_transcription(room, transcription_id)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed * 1000:8.1f}ms  {sum(calls.values()) - before} Whereby calls  ({state})")
+    return transcription_id
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=int, default=30, help="length of the synthetic visit")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub Whereby latency per call")
+    args = parser.parse_args()
+
+    init_db()
+    text = fake_transcript(args.minutes)
+    codec, blob = transcripts.compress(text)
+    print(f"transcript: {len(text.encode())} bytes raw, {len(blob)} bytes {codec} ({len(blob) / len(text.encode()):.0%})")
+
+    app = build_app(args.latency, {"bench-room": text})
+    with StubServer(app, WHEREBY_PORT):
+        calls = app.state.calls
+        transcription_id = timed("first lookup (download + store)", "bench-room", calls)
+        timed("same visit (store hit)", "bench-room", calls, transcription_id)
+        # Another visit in the room has no id yet: it lists, but skips the download
+        timed("new visit, same room (listing only)", "bench-room", calls)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Per-request DB time for Visit reads and writes with 50 KB transcripts.
+
+Compares the old pattern (load every column, mutate the ORM object, commit)
+with the deferred-column load plans and single-statement UPDATEs.
+
+Run from the api/ directory:
+
+    python -m bench.visit_db_time --visits 2000 --requests 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+# app.main builds its engine at import; keep any database file out of the working tree
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/app.sqlite")
+
+from sqlalchemy.orm import sessionmaker, undefer  # noqa: E402
+
+from app.audit import record_event  # noqa: E402
+from app.db import create_db_engine  # noqa: E402
+from app.main import VISIT_RESPONSE_LOAD_PLAN, _update_visit  # noqa: E402
+from app.models import Base, Visit  # noqa: E402
+
+
+def seed(Session, n: int, transcript_kb: int) -> list:
+    transcript = "Provider: How are you feeling today?\n" * (transcript_kb * 1024 // 38)
+    intake = [{"q": f"Question {i}?", "a": "An answer of moderate length." * 4} for i in range(10)]
+    ids = [str(uuid.uuid4()) for _ in range(n)]
+    with Session() as db:
+        db.add_all(
+            Visit(
+                id=vid,
+                status="summary_ready",
+                intake_raw=intake,
+                intake_structured={"reason": "birth control consult", "age": 20},
+                provider_note="Chief concern: contraception.",
+                patient_summary="We talked about your options.",
+                video_room_id="room",
+                transcription_text=transcript,
+            )
+            for vid in ids
+        )
+        db.commit()
+    return ids
+
+
+def timed(Session, ids: list, requests: int, fn) -> list:
+    samples = []
+    for _ in range(requests):
+        vid = random.choice(ids)
+        db = Session()
+        start = time.perf_counter()
+        fn(db, vid)
+        samples.append((time.perf_counter() - start) * 1e6)
+        db.close()
+    return samples
+
+
+def pharmacy_old(db, vid):
+    visit = db.query(Visit).options(undefer("*")).filter(Visit.id == vid).first()
+    visit.pharmacy_request = {"plan": "pill", "order_id": f"stub-{vid[:8]}"}
+    visit.status = "pharmacy_created"
+    record_event(db, vid, "pharmacy_created")
+    db.commit()
+
+
+def pharmacy_new(db, vid):
+    _update_visit(db, vid, {"pharmacy_request": {"plan": "pill", "order_id": f"stub-{vid[:8]}"}, "status": "pharmacy_created"})
+    record_event(db, vid, "pharmacy_created")
+    db.commit()
+
+
+def get_visit_old(db, vid):
+    visit = db.query(Visit).options(undefer("*")).filter(Visit.id == vid).first()
+    visit.intake_raw, visit.intake_structured, visit.pharmacy_request
+
+
+def get_visit_new(db, vid):
+    visit = db.query(Visit).options(VISIT_RESPONSE_LOAD_PLAN).filter(Visit.id == vid).first()
+    visit.intake_raw, visit.intake_structured, visit.pharmacy_request
+
+
+def report(label: str, samples: list) -> None:
+    q = statistics.quantiles(samples, n=100)
+    print(f"{label:<34} p50 {q[49]:8.0f} us   p95 {q[94]:8.0f} us   p99 {q[98]:8.0f} us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--visits", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--transcript-kb", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = create_db_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'visits.sqlite')}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    ids = seed(Session, args.visits, args.transcript_kb)
+
+    report("GET /visit, all columns", timed(Session, ids, args.requests, get_visit_old))
+    report("GET /visit, load plan", timed(Session, ids, args.requests, get_visit_new))
+    report("/pharmacy_order, load + mutate", timed(Session, ids, args.requests, pharmacy_old))
+    report("/pharmacy_order, single UPDATE", timed(Session, ids, args.requests, pharmacy_new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Serialization cost of GET /visit/{id} for visits with large intake and audit payloads.
+
+Compares building a validated VisitResponse (the previous handler), an
+unvalidated model_construct, and the raw path that copies JSON column text
+into the body. Run from the api/ directory:
+
+    python -m bench.visit_serialization --questions 200 --events 500 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# app.main builds its engine at import; keep any database file out of the working tree
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+
+from app import main as api  # noqa: E402
+from app import serialization  # noqa: E402
+from app.audit import load_audit_events, record_events  # noqa: E402
+from app.db import SessionLocal, init_db  # noqa: E402
+from app.models import Visit  # noqa: E402
+from app.schemas import VisitResponse  # noqa: E402
+
+
+def seed(questions: int, events: int) -> str:
+    visit_id = str(uuid.uuid4())
+    intake_raw = [{"q": f"Question {i}: how often does this happen?", "a": "Every few weeks, mostly mornings. " * 3}
+                  for i in range(questions)]
+    structured = {
+        "reason": "birth control consult",
+        "age": 29,
+        "contra_indications": [f"condition {i}" for i in range(questions // 4)],
+        "history": {f"item_{i}": {"since": "2019", "notes": "stable, no changes"} for i in range(questions // 2)},
+        "preferences": {"delivery": "mail", "reminders": True},
+    }
+    start = datetime.utcnow() - timedelta(days=1)
+    with SessionLocal() as db:
+        db.add(Visit(
+            id=visit_id, status="pharmacy_created", intake_raw=intake_raw, intake_structured=structured,
+            patient_profile={"name": "Bench Patient", "dob": "1996-01-01"},
+            provider_note="Chief concern: contraception. " * 20, patient_summary="We talked about your options. " * 20,
+            video_room_id="room", pharmacy_request={"plan": "monthly", "shipping": {"city": "Springfield"}},
+        ))
+        record_events(db, [(visit_id, f"event_{i % 7}", start + timedelta(seconds=i)) for i in range(events)])
+        db.commit()
+    return visit_id
+
+
+def validated(db, visit_id: str) -> bytes:
+    visit = db.query(Visit).options(api.VISIT_RESPONSE_LOAD_PLAN).filter(Visit.id == visit_id).first()
+    fields = {name: getattr(visit, name) for name in VisitResponse.model_fields if name != "audit_events"}
+    response = VisitResponse(**fields, audit_events=load_audit_events(db, visit_id))
+    return response.model_dump_json().encode()
+
+
+def constructed(db, visit_id: str) -> bytes:
+    visit = db.query(Visit).options(api.VISIT_RESPONSE_LOAD_PLAN).filter(Visit.id == visit_id).first()
+    fields = {name: getattr(visit, name) for name in VisitResponse.model_fields if name != "audit_events"}
+    response = VisitResponse.model_construct(**fields, audit_events=load_audit_events(db, visit_id))
+    return response.model_dump_json().encode()
+
+
+def raw(db, visit_id: str) -> bytes:
+    return api._get_visit_raw(db, visit_id).body
+
+
+def time_fn(fn, visit_id: str, requests: int) -> list:
+    samples = []
+    for _ in range(requests):
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            fn(db, visit_id)
+            samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+async def time_http(visit_id: str, requests: int, raw_json: bool) -> list:
+    api.VISIT_RESPONSE_RAW_JSON = raw_json
+    samples = []
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get(f"/visit/{visit_id}")
+            samples.append((time.perf_counter() - start) * 1e6)
+            response.raise_for_status()
+    return samples
+
+
+def report(label: str, samples: list) -> None:
+    ordered = sorted(samples)
+    print(f"{label:<36} median {statistics.median(ordered):8.0f}us  p95 {ordered[int(len(ordered) * 0.95)]:8.0f}us")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=200, help="intake Q&A pairs per visit")
+    parser.add_argument("--events", type=int, default=500, help="audit events per visit")
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    init_db()
+    visit_id = seed(args.questions, args.events)
+    with SessionLocal() as db:
+        body = raw(db, visit_id)
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    print(f"response body {len(body) / 1024:.0f} KB, encoder {encoder}")
+
+    report("handler: validated VisitResponse", time_fn(validated, visit_id, args.requests))
+    report("handler: model_construct", time_fn(constructed, visit_id, args.requests))
+    report("handler: raw JSON columns", time_fn(raw, visit_id, args.requests))
+    report("GET /visit: model_construct", asyncio.run(time_http(visit_id, args.requests, raw_json=False)))
+    report("GET /visit: VISIT_RESPONSE_RAW_JSON", asyncio.run(time_http(visit_id, args.requests, raw_json=True)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Commits per second and POST /visit latency with and without the write-behind committer.
+
+Fires `--visits` concurrent visit creations at the app in-process and counts
+database commits. Run from the api/ directory:
+
+    python -m bench.write_behind --visits 500
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# app.main builds its engine at import; keep any database file out of the working tree
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+from sqlalchemy import event, func  # noqa: E402
+
+from app.db import SessionLocal, engine, init_db  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import VisitEvent  # noqa: E402
+from app.write_behind import write_behind  # noqa: E402
+
+commits = 0
+
+
+@event.listens_for(engine, "commit")
+def _count_commit(conn):
+    global commits
+    commits += 1
+
+
+def percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run(visits: int) -> list:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def create() -> None:
+            start = time.perf_counter()
+            response = await client.post("/visit")
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+        await asyncio.gather(*[create() for _ in range(visits)])
+    return latencies
+
+
+def measure(label: str, visits: int, enabled: bool) -> None:
+    global commits
+    if enabled:
+        write_behind.start()
+    commits = 0
+    start = time.perf_counter()
+    latencies = asyncio.run(run(visits))
+    # Time until every audit event is durable, not just until the last response
+    write_behind.barrier()
+    elapsed = time.perf_counter() - start
+    write_behind.stop()
+    print(
+        f"{label:<14} {visits / elapsed:7.0f} visits/s  {commits:5d} commits ({commits / elapsed:6.0f}/s)  "
+        f"p50 {percentile(latencies, 0.5) * 1000:6.1f}ms  p99 {percentile(latencies, 0.99) * 1000:6.1f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--visits", type=int, default=500, help="concurrent visit creations per run")
+    args = parser.parse_args()
+
+    # ASGITransport doesn't run the lifespan, so create the schema and drive the writer here
+    init_db()
+    measure("inline", args.visits, enabled=False)
+    measure("write-behind", args.visits, enabled=True)
+    with SessionLocal() as db:
+        events = db.query(func.count(VisitEvent.id)).scalar()
+    print(f"visit_created events stored: {events} of {2 * args.visits}; writer stats {write_behind.stats()}")
+
+
+if __name__ == "__main__":
+    main()
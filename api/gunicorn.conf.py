@@ -0,0 +1,16 @@
+"""gunicorn settings for the multi-process profile (needs `pip install gunicorn`).
+
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+from app.serve import SERVE_HOST, SERVE_PORT, prepare_worker_env, worker_count
+
+bind = f"{SERVE_HOST}:{SERVE_PORT}"
+workers = worker_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app in each worker, after the fork, so no engine, thread or event loop is inherited
+preload_app = False
+# Summary jobs and SSE streams can outlive gunicorn's 30s default
+timeout = 120
+graceful_timeout = 30
+
+prepare_worker_env(workers)
@@ -0,0 +1,32 @@
+"""Intake repair when the provider fails and the stub fallback is on."""
+import asyncio
+import json
+
+from app import intake, llm
+
+
+def test_repair_keeps_invalid_fields_when_the_stub_answers(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_API_KEY", "test")
+    monkeypatch.setattr(llm, "LLM_STUB_FALLBACK", True)
+    monkeypatch.setattr(llm, "LLM_CACHE_ENABLED", False)
+
+    async def provider_down(*args, **kwargs):
+        raise llm.httpx.ConnectError("provider down")
+
+    monkeypatch.setattr(llm, "_dispatch", provider_down)
+    completion = json.dumps({
+        "intake_structured": {
+            "reason": "acne", "age": "thirty-four", "contra_indications": "migraine with aura",
+        },
+        "provider_note": "note",
+        "patient_summary": "summary",
+    })
+
+    result = asyncio.run(intake.parse_intake_completion(completion))
+
+    assert result.fallback
+    assert result.intake_structured["reason"] == "acne"
+    assert result.intake_structured["age"] is None
+    assert result.intake_structured["contra_indications"] is None
+    assert result.invalid_fields["age"][0] == "thirty-four"
+    assert result.invalid_fields["contra_indications"][0] == "migraine with aura"